@@ -0,0 +1,146 @@
+import os
+
+import dotenv
+import numpy as np
+import pandas as pd
+
+dotenv.load_dotenv()
+
+INDEX_PATH = os.environ.get("ENGAGEMENT_INDEX_PATH", "analysis_state/engagement_index.npz")
+HALF_LIFE_HOURS = float(os.environ.get("VELOCITY_HALF_LIFE_HOURS", "12"))
+# Floor on the time a velocity is measured over, so a post a few minutes old
+# with a handful of points can't extrapolate to thousands per hour.
+MIN_ELAPSED_HOURS = 1.0
+# Posts not observed for this long are dropped from the index on save.
+HISTORY_RETENTION_DAYS = 14
+
+
+class EngagementIndex:
+    """
+    Per-post engagement state across runs, stored as columnar numpy arrays
+    (one row per post): id, last_ts, last_engagement, velocity. Each run
+    folds its snapshot into `velocity` (engagement per hour, exponentially
+    time-decayed) without recomputing past runs.
+    """
+
+    def __init__(self, path=INDEX_PATH, half_life_hours=HALF_LIFE_HOURS):
+        self.path = path
+        self.half_life = half_life_hours * 3600.0
+
+        self.ids = np.array([], dtype=str)
+        self.last_ts = np.array([], dtype=np.float64)
+        self.last_engagement = np.array([], dtype=np.float64)
+        self.velocity = np.array([], dtype=np.float64)
+
+        self._positions = {}
+
+    @classmethod
+    def load(cls, path=INDEX_PATH, half_life_hours=HALF_LIFE_HOURS):
+        index = cls(path, half_life_hours)
+        if not os.path.exists(path):
+            return index
+
+        with np.load(path, allow_pickle=False) as data:
+            for name in ("ids", "last_ts", "last_engagement", "velocity"):
+                setattr(index, name, data[name])
+        index._positions = {post_id: i for i, post_id in enumerate(index.ids.tolist())}
+        return index
+
+    def prune(self):
+        """Drop posts not observed within HISTORY_RETENTION_DAYS of the latest snapshot."""
+        cutoff = np.nanmax(self.last_ts, initial=0.0) - HISTORY_RETENTION_DAYS * 86400
+        keep = ~(self.last_ts < cutoff)
+        if keep.all():
+            return
+        for name in ("ids", "last_ts", "last_engagement", "velocity"):
+            setattr(self, name, getattr(self, name)[keep])
+        self._positions = {post_id: i for i, post_id in enumerate(self.ids.tolist())}
+
+    def save(self):
+        self.prune()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.tmp.npz"
+        np.savez(
+            tmp,
+            ids=self.ids,
+            last_ts=self.last_ts,
+            last_engagement=self.last_engagement,
+            velocity=self.velocity,
+        )
+        os.replace(tmp, self.path)
+
+    def _decay(self, elapsed_seconds):
+        return np.exp2(-elapsed_seconds / self.half_life)
+
+    def update(self, post_ids, engagement, posted_at, now=None):
+        """
+        Fold one snapshot into the index.
+        Input: parallel sequences of post ids, engagement scores and posted_at timestamps.
+        """
+        now = pd.Timestamp.now(tz="UTC").timestamp() if now is None else now
+        post_ids = [str(p) for p in post_ids]
+        engagement = np.asarray(engagement, dtype=np.float64)
+
+        # 1. Resolve rows, appending never-seen posts
+        start = len(self.ids)
+        new_ids = [p for p in dict.fromkeys(post_ids) if p not in self._positions]
+        if new_ids:
+            for offset, post_id in enumerate(new_ids):
+                self._positions[post_id] = start + offset
+            self.ids = np.concatenate([self.ids, np.array(new_ids, dtype=str)])
+            # New posts start from zero engagement at their posting time, so
+            # the first velocity is lifetime engagement / age. Posts without a
+            # usable posted_at get NaN here and start at zero velocity instead.
+            posted_ts = pd.to_datetime(pd.Series(posted_at), utc=True, errors="coerce")
+            posted_ts = posted_ts.map(lambda t: t.timestamp() if pd.notna(t) else np.nan).to_numpy(np.float64)
+            first_seen = {p: ts for p, ts in zip(post_ids, posted_ts)}
+            self.last_ts = np.concatenate([self.last_ts, np.minimum([first_seen[p] for p in new_ids], now)])
+            self.last_engagement = np.concatenate([self.last_engagement, np.zeros(len(new_ids))])
+            self.velocity = np.concatenate([self.velocity, np.zeros(len(new_ids))])
+
+        rows = np.fromiter((self._positions[p] for p in post_ids), dtype=np.int64, count=len(post_ids))
+
+        # 2. Instantaneous velocity since each post's previous snapshot (per hour)
+        undated = np.isnan(self.last_ts[rows])
+        elapsed = np.maximum(np.where(undated, 0.0, now - self.last_ts[rows]), 0.0)
+        instant = (engagement - self.last_engagement[rows]) / np.maximum(elapsed / 3600.0, MIN_ELAPSED_HOURS)
+        instant[undated] = 0.0
+
+        # 3. Time-decayed blend: older velocity fades by how long ago it was observed
+        decay = self._decay(elapsed)
+        is_new = rows >= start
+        blended = np.where(is_new, instant, decay * self.velocity[rows] + (1 - decay) * instant)
+
+        self.velocity[rows] = blended
+        self.last_ts[rows] = now
+        self.last_engagement[rows] = engagement
+
+    def current_velocity(self, post_ids, now=None):
+        """Velocity per post, decayed for the time since it was last observed."""
+        now = pd.Timestamp.now(tz="UTC").timestamp() if now is None else now
+        rows = np.array([self._positions.get(str(p), -1) for p in post_ids], dtype=np.int64)
+        known = rows >= 0
+
+        out = np.zeros(len(rows), dtype=np.float64)
+        idx = rows[known]
+        out[known] = self.velocity[idx] * self._decay(np.maximum(now - self.last_ts[idx], 0.0))
+        return out
+
+
+def rank_clusters(clusters, top_n):
+    """
+    Input: Dictionary mapping Cluster ID to list of posts carrying a 'velocity' field
+    Output: Up to top_n (cluster_id, cluster_velocity) pairs, fastest-accelerating first
+    """
+    if not clusters or top_n <= 0:
+        return []
+
+    labels = np.array(list(clusters.keys()))
+    sizes = np.array([len(posts) for posts in clusters.values()])
+    velocities = np.concatenate([[p.get("velocity", 0.0) for p in posts] for posts in clusters.values()])
+
+    # Sum per cluster in one pass over the flattened post velocities
+    cluster_velocity = np.add.reduceat(velocities, np.concatenate([[0], np.cumsum(sizes)[:-1]]))
+
+    order = np.argsort(-cluster_velocity, kind="stable")[:top_n]
+    return [(int(labels[i]), float(cluster_velocity[i])) for i in order]
@@ -0,0 +1,200 @@
+"""
+Listing parse benchmark: the original json.loads + map_post path versus the
+per-child parse_listing path, each including serialization of kept posts to
+spool lines. Reports posts/sec and peak traced memory, which counts the
+response body as requests holds it (`content` bytes plus decoded `text`),
+since both paths download the whole listing before parsing. The per-child
+path still decodes every child in full before filtering, so its gain is the
+decoded tree it never holds, not decode work; at low keep ratios it can be
+slightly slower than one json.loads.
+
+    python -m benchmarks.bench_listing_parse --posts 1000 --keep-ratio 0.2
+"""
+import argparse
+import json
+import random
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from collectors.reddit_collector import parse_listing, should_keep_post
+from collectors.spool import _to_json
+
+
+def make_listing(n_posts, keep_ratio, seed=7):
+    """Synthetic listing shaped like reddit's, with `keep_ratio` of posts matching the keyword filter."""
+    rng = random.Random(seed)
+    children = []
+    for i in range(n_posts):
+        keep = rng.random() < keep_ratio
+        title = f"My new cozy setup #{i}" if keep else f"Weekly discussion thread #{i}"
+        image_id = f"img{i:06d}"
+        children.append({
+            "kind": "t3",
+            "data": {
+                "id": f"p{i:06d}",
+                "title": title,
+                "selftext": "Lorem ipsum dolor sit amet. " * rng.randint(5, 60),
+                "permalink": f"/r/test/comments/p{i:06d}/post/",
+                "created_utc": 1700000000 + i,
+                "score": rng.randint(0, 5000),
+                "num_comments": rng.randint(0, 500),
+                "upvote_ratio": round(rng.random(), 2),
+                "is_self": False,
+                "post_hint": "image",
+                "url": f"https://i.redd.it/{image_id}.jpg",
+                "thumbnail": f"https://b.thumbs.redditmedia.com/{image_id}.jpg",
+                "preview": {
+                    "images": [{
+                        "source": {"url": f"https://preview.redd.it/{image_id}.jpg?width=1920&amp;s=abc", "width": 1920},
+                        "resolutions": [
+                            {"url": f"https://preview.redd.it/{image_id}.jpg?width={w}&amp;s=abc", "width": w}
+                            for w in (108, 216, 320, 640, 960, 1080)
+                        ],
+                        "id": image_id,
+                    }],
+                    "enabled": True,
+                },
+                "all_awardings": [{"name": "award", "count": 1, "description": "x" * 80}] * 3,
+                "link_flair_richtext": [{"e": "text", "t": "Showcase"}],
+            },
+        })
+    return json.dumps({"kind": "Listing", "data": {"after": None, "dist": n_posts, "children": children}})
+
+
+def legacy_get_best_media_url(post):
+    gallery_metadata = post.get("media_metadata") or {}
+    if post.get("is_gallery") and gallery_metadata:
+        for media in gallery_metadata.values():
+            source = media.get("s") if isinstance(media, dict) else None
+            candidate = source.get("u") if source else None
+            if candidate:
+                return candidate.replace("&amp;", "&")
+
+    preview_images = ((post.get("preview") or {}).get("images") or [])
+    if preview_images:
+        source = preview_images[0].get("source") or {}
+        preview_url = source.get("url")
+        if preview_url:
+            return preview_url.replace("&amp;", "&")
+
+    for field in ("url_overridden_by_dest", "url"):
+        candidate = post.get(field)
+        if candidate:
+            return candidate
+
+    return None
+
+
+def legacy_map_post(subreddit, fetch_variant, post):
+    posted_at = datetime.fromtimestamp(post["created_utc"], tz=timezone.utc).isoformat()
+    media_url = legacy_get_best_media_url(post)
+    post_hint = post.get("post_hint")
+
+    media_type = "text"
+    if post.get("is_gallery"):
+        media_type = "gallery"
+    elif post_hint in {"image", "link", "hosted:video", "rich:video"}:
+        media_type = post_hint
+    elif media_url:
+        media_type = "media"
+
+    preview_images = ((post.get("preview") or {}).get("images") or [])
+    thumbnail = None
+    if preview_images:
+        thumbnail = ((preview_images[0].get("source") or {}).get("url") or "").replace("&amp;", "&") or None
+
+    return {
+        "source_platform": "reddit",
+        "external_id": post["id"],
+        "title": post.get("title", ""),
+        "content": post.get("selftext", "")[:2000],
+        "url": f"https://reddit.com{post.get('permalink', '')}",
+        "author_name": f"r/{subreddit}",
+        "posted_at": posted_at,
+        "engagement_score": post.get("score", 0) + post.get("num_comments", 0),
+        "metadata": {
+            "subreddit": subreddit,
+            "fetch_variant": fetch_variant,
+            "upvotes": post.get("score", 0),
+            "comments": post.get("num_comments", 0),
+            "upvote_ratio": post.get("upvote_ratio", 0),
+            "is_self": post.get("is_self", False),
+            "post_hint": post_hint,
+            "is_gallery": post.get("is_gallery", False),
+            "media_url": media_url,
+            "media_type": media_type,
+            "thumbnail": thumbnail or post.get("thumbnail"),
+            "url_overridden_by_dest": post.get("url_overridden_by_dest"),
+        },
+        "raw_data": post,
+    }
+
+
+def legacy_parse(subreddit, fetch_variant, text):
+    data = json.loads(text)
+    deduped = {}
+    for child in data.get("data", {}).get("children", []):
+        post = child.get("data", {})
+        full_text = f"{post.get('title', '')} {post.get('selftext', '')}".lower()
+        if not should_keep_post(subreddit, full_text):
+            continue
+        mapped = legacy_map_post(subreddit, fetch_variant, post)
+        deduped[mapped["external_id"]] = mapped
+    return deduped
+
+
+def per_child_parse(subreddit, fetch_variant, text):
+    return parse_listing(subreddit, fetch_variant, text, {})
+
+
+def legacy_end_to_end(subreddit, fetch_variant, text):
+    return [_to_json(row) for row in legacy_parse(subreddit, fetch_variant, text).values()]
+
+
+def per_child_end_to_end(subreddit, fetch_variant, text):
+    return [_to_json(record) for record in per_child_parse(subreddit, fetch_variant, text).values()]
+
+
+def measure(fn, text, repeats):
+    tracemalloc.start()
+    # Stand-ins for response.content and response.text, which are alive while parsing.
+    content = text.encode("utf-8")
+    body = content.decode("utf-8")
+    result = fn("test", "new", body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result, body, content
+
+    started = time.perf_counter()
+    for _ in range(repeats):
+        fn("test", "new", text)
+    elapsed = time.perf_counter() - started
+    return peak, elapsed / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=1000)
+    parser.add_argument("--keep-ratio", type=float, default=0.2)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    text = make_listing(args.posts, args.keep_ratio)
+
+    legacy_rows = legacy_parse("test", "new", text)
+    kept = per_child_parse("test", "new", text)
+    assert list(legacy_rows) == list(kept), "kept posts differ"
+    for external_id, record in kept.items():
+        assert record.to_row() == legacy_rows[external_id], f"row mismatch for {external_id}"
+        assert json.loads(_to_json(record)) == legacy_rows[external_id], f"spool line mismatch for {external_id}"
+
+    print(f"listing: {args.posts} posts, {len(text) / 1e6:.2f} MB, {len(kept)} kept")
+    print(f"{'path':<12}{'peak MB':>10}{'posts/sec':>14}")
+    for name, fn in (("legacy", legacy_end_to_end), ("per-child", per_child_end_to_end)):
+        peak, per_run = measure(fn, text, args.repeats)
+        print(f"{name:<12}{peak / 1e6:>10.2f}{args.posts / per_run:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import os
+import threading
+import time
+
+import dotenv
+import requests
+from requests.adapters import HTTPAdapter
+
+dotenv.load_dotenv()
+
+SUPABASE_URL = os.environ.get("SUPABASE_URL")
+SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
+
+USER_AGENT = "python:trend-hunter:v1.1 (by /u/ConfidentSession1009)"
+HTTP_POOL_SIZE = 16
+
+SOCIAL_INPUTS_TABLE = "social_inputs"
+SOCIAL_INPUTS_CONFLICT = "source_platform, external_id"
+
+# name -> Source subclass, filled in by @register_source
+SOURCES = {}
+
+_pool_lock = threading.Lock()
+_http_session = None
+_supabase = None
+
+
+def get_http_session():
+    """Process-wide requests.Session so every source shares one connection pool."""
+    global _http_session
+    with _pool_lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers["User-Agent"] = USER_AGENT
+            _http_session = session
+        return _http_session
+
+
+def get_supabase():
+    """Process-wide Supabase client, created on first use."""
+    global _supabase
+    with _pool_lock:
+        if _supabase is None:
+            from supabase import create_client
+
+            _supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+        return _supabase
+
+
+class RateBudget:
+    """Spaces calls so a single source never exceeds `per_minute` requests."""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_at - now
+            self._next_at = max(now, self._next_at) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def get_with_backoff(url, headers=None, params=None, max_retries=4, session=None, budget=None,
+                     parse=None):
+    """
+    GET with 429/error backoff. Returns `parse(response)` (the response itself
+    by default) or None; a body that fails to parse is retried like any
+    other request error.
+    """
+    session = session or get_http_session()
+    for attempt in range(max_retries):
+        if budget:
+            budget.wait()
+        try:
+            response = session.get(url, headers=headers, params=params, timeout=15)
+            if response.status_code == 429:
+                backoff = min(2 ** attempt, 16)
+                print(f"Rate limited on {url} with params={params}. Retrying in {backoff}s...")
+                time.sleep(backoff)
+                continue
+
+            response.raise_for_status()
+            return parse(response) if parse else response
+        except (requests.RequestException, ValueError) as exc:
+            if attempt == max_retries - 1:
+                print(f"Request failed for {url} params={params}: {exc}")
+                return None
+            backoff = min(2 ** attempt, 16)
+            print(f"Request error for {url} params={params}: {exc}. Retrying in {backoff}s...")
+            time.sleep(backoff)
+    return None
+
+
+def fetch_json_with_backoff(url, headers=None, params=None, max_retries=4, session=None, budget=None):
+    return get_with_backoff(url, headers, params, max_retries, session, budget, parse=lambda r: r.json())
+
+
+def as_row(row):
+    """Compact record types serialize themselves only at write time."""
+    return row.to_row() if hasattr(row, "to_row") else row
+
+
+class SocialInputWriter:
+    """Shared write path: every source hands its mapped rows here for upsert."""
+
+    def __init__(self, client=None):
+        self.client = client
+        self._lock = threading.Lock()
+        self.saved = 0
+
+    def write(self, rows, label):
+        if not rows:
+            return 0
+
+        client = self.client or get_supabase()
+        try:
+            client.table(SOCIAL_INPUTS_TABLE).upsert(
+                [as_row(row) for row in rows],
+                on_conflict=SOCIAL_INPUTS_CONFLICT,
+                ignore_duplicates=False,
+            ).execute()
+        except Exception as exc:
+            print(f"DB Error for {label}: {exc}")
+            return 0
+
+        with self._lock:
+            self.saved += len(rows)
+        print(f"Saved {len(rows)} rows from {label}")
+        return len(rows)
+
+
+class Source:
+    """
+    A collector plugin. Subclasses set `name`, optionally `rate_per_minute`,
+    and implement `iter_batches()` yielding (label, rows) pairs, each row a
+    `social_inputs` dict or a record with `to_row()`.
+    """
+
+    name = None
+    rate_per_minute = 60
+
+    def __init__(self, session=None):
+        self.session = session or get_http_session()
+        self.budget = RateBudget(self.rate_per_minute)
+
+    def fetch_json(self, url, headers=None, params=None):
+        return fetch_json_with_backoff(url, headers, params, session=self.session, budget=self.budget)
+
+    def fetch_text(self, url, headers=None, params=None, content_type=None):
+        """
+        Response body as text. With `content_type`, a body of any other type
+        (e.g. an HTML error page served with 200) is retried like a failed request.
+        """
+        def parse(response):
+            if content_type and not response.headers.get("Content-Type", "").startswith(content_type):
+                raise ValueError(f"expected {content_type}, got {response.headers.get('Content-Type')!r}")
+            return response.text
+
+        return get_with_backoff(url, headers, params, session=self.session, budget=self.budget, parse=parse)
+
+    def iter_batches(self):
+        raise NotImplementedError
+
+    def run(self, writer):
+        saved = 0
+        for label, rows in self.iter_batches():
+            saved += writer.write(rows, label)
+        return saved
+
+
+def register_source(cls):
+    """Class decorator that makes a Source discoverable by the runner."""
+    if not cls.name:
+        raise ValueError(f"{cls.__name__} must define a source name")
+    SOURCES[cls.name] = cls
+    return cls
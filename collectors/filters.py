@@ -0,0 +1,106 @@
+import re
+
+# Shared keyword/blacklist lists so every source filters the same way.
+KEYWORD_PATTERNS = [
+    r"\boverlay(?:s)?\b",
+    r"\bwidget(?:s)?\b",
+    r"\bhud\b",
+    r"\btheme(?:s)?\b",
+    r"\baesthetic(?:s)?\b",
+    r"\bplugin(?:s)?\b",
+    r"\btransition(?:s)?\b",
+    r"\bstinger(?:s)?\b",
+    r"\balert(?:s)?\b",
+    r"\bchat\s?box(?:es)?\b",
+    r"\bpanel(?:s)?\b",
+    r"\bcozy\b",
+    r"\bcyberpunk\b",
+    r"\boutrun\b",
+    r"\bretro\b",
+    r"\bpixel\b",
+    r"\bsetup(?:s)?\b",
+    r"\bstation(?:s)?\b",
+    r"\bdesk(?:s)?\b",
+    r"\broom(?:s)?\b",
+    r"\bvibe(?:s)?\b",
+    r"\blayout(?:s)?\b",
+    r"\brebrand(?:ing)?\b",
+    r"\basset(?:s)?\b",
+    r"\bdesign(?:s|er)?\b",
+    r"\bvtuber\smodel(?:s)?\b",
+    r"\bemote(?:s)?\b",
+    r"\bbadge(?:s)?\b",
+    r"\bshowcase\b",
+    r"\binspiration\b",
+]
+
+# Only high-signal support/problem terms to reduce false negatives.
+BLACKLIST_PATTERNS = [
+    r"\berror(?:s)?\b",
+    r"\bcrash(?:es|ed|ing)?\b",
+    r"\bbug(?:s)?\b",
+    r"\bbroken\b",
+    r"\bhow\s+to\s+fix\b",
+    r"\bbitrate\b",
+    r"\bdropped\s+frames?\b",
+    r"\bstutter(?:ing)?\b",
+    r"\bdisconnect(?:ed|ion|ing)?\b",
+    r"\blogin\b",
+    r"\bpassword\b",
+    r"\bdriver(?:s)?\b",
+    r"\bblack\s+screen\b",
+    r"\bblue\s+screen\b",
+]
+
+# Video titles/descriptions are noisier, so YouTube uses its own tuned lists.
+VIDEO_KEYWORD_PATTERNS = [
+    r"\boverlay(?:s)?\b",
+    r"\bwidget(?:s)?\b",
+    r"\bhud\b",
+    r"\btheme(?:s)?\b",
+    r"\baesthetic(?:s)?\b",
+    r"\bplugin(?:s)?\b",
+    r"\bobs\b",
+    r"\btransition(?:s)?\b",
+    r"\bstinger(?:s)?\b",
+    r"\balert(?:s)?\b",
+    r"\bchat\s?box(?:es)?\b",
+    r"\bpanel(?:s)?\b",
+    r"\bsetup(?:s)?\b",
+    r"\bdesk(?:s)?\b",
+    r"\broom(?:s)?\b",
+    r"\btour(?:s)?\b",
+    r"\bvibe(?:s)?\b",
+    r"\bcozy\b",
+    r"\bminimal(?:ist)?\b",
+    r"\bcyberpunk\b",
+    r"\bretro\b",
+    r"\bpixel\b",
+]
+
+VIDEO_BLACKLIST_PATTERNS = [
+    r"\berror(?:s)?\b",
+    r"\bcrash(?:es|ed|ing)?\b",
+    r"\bbug(?:s)?\b",
+    r"\bfix(?:ing|ed)?\b",
+    r"\bbitrate\b",
+    r"\bdropped\s+frames?\b",
+    r"\bstutter(?:ing)?\b",
+]
+
+KEYWORD_REGEX = re.compile("|".join(KEYWORD_PATTERNS), re.IGNORECASE)
+BLACKLIST_REGEX = re.compile("|".join(BLACKLIST_PATTERNS), re.IGNORECASE)
+VIDEO_KEYWORD_REGEX = re.compile("|".join(VIDEO_KEYWORD_PATTERNS), re.IGNORECASE)
+VIDEO_BLACKLIST_REGEX = re.compile("|".join(VIDEO_BLACKLIST_PATTERNS), re.IGNORECASE)
+
+
+def is_relevant_text(full_text, always_keep=False,
+                     keyword_regex=KEYWORD_REGEX, blacklist_regex=BLACKLIST_REGEX):
+    """Blacklist always wins; otherwise keep on a keyword hit (or unconditionally if always_keep)."""
+    if blacklist_regex.search(full_text):
+        return False
+
+    if always_keep:
+        return True
+
+    return bool(keyword_regex.search(full_text))
@@ -0,0 +1,123 @@
+import html
+import re
+
+from collectors.base import Source, register_source
+from collectors.filters import is_relevant_text
+from collectors.spool import spooled_writer
+
+# Config
+INSTANCES = [
+    "mastodon.social",
+    "mastodon.gamedev.place",
+]
+
+HASHTAGS = [
+    "streaming", "twitch", "vtuber", "obs",
+    "desksetup", "battlestation", "unixporn",
+    "pixelart", "cyberpunk", "cozygaming",
+]
+
+TIMELINE_LIMIT = 40
+
+BREAK_REGEX = re.compile(r"<br\s*/?>|</p>", re.IGNORECASE)
+TAG_REGEX = re.compile(r"<[^>]+>")
+
+
+def strip_html(content):
+    """Mastodon returns status bodies as HTML; keep only the text, one line per paragraph."""
+    text = html.unescape(TAG_REGEX.sub("", BREAK_REGEX.sub("\n", content or "")))
+    lines = (" ".join(line.split()) for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def get_media_url(status):
+    for attachment in status.get("media_attachments") or []:
+        candidate = attachment.get("preview_url") or attachment.get("url")
+        if candidate:
+            return candidate
+    return None
+
+
+def should_keep_status(status):
+    spoiler = status.get("spoiler_text") or ""
+    full_text = f"{spoiler} {strip_html(status.get('content'))}".lower()
+    return is_relevant_text(full_text)
+
+
+def map_status(instance, hashtag, status):
+    account = status.get("account") or {}
+    text = strip_html(status.get("content"))
+    media_url = get_media_url(status)
+
+    favourites = status.get("favourites_count", 0)
+    reblogs = status.get("reblogs_count", 0)
+    replies = status.get("replies_count", 0)
+
+    return {
+        "source_platform": "mastodon",
+        # `uri` is the federated id, so the same status seen via two instances dedupes.
+        "external_id": status.get("uri") or f"{instance}:{status['id']}",
+        "title": (status.get("spoiler_text") or text.split("\n", 1)[0])[:300],
+        "content": text[:2000],
+        "url": status.get("url") or status.get("uri"),
+        "author_name": account.get("acct", ""),
+        "posted_at": status.get("created_at"),
+        "engagement_score": favourites + reblogs + replies,
+        "metadata": {
+            "instance": instance,
+            "hashtag": hashtag,
+            "favourites": favourites,
+            "reblogs": reblogs,
+            "replies": replies,
+            "tags": [t.get("name") for t in status.get("tags") or []],
+            "media_url": media_url,
+            "media_type": "media" if media_url else "text",
+        },
+        "raw_data": status,
+    }
+
+
+def fetch_hashtag_statuses(source, instance, hashtag):
+    url = f"https://{instance}/api/v1/timelines/tag/{hashtag}"
+    statuses = source.fetch_json(url, params={"limit": TIMELINE_LIMIT})
+    if not statuses:
+        return []
+
+    deduped = {}
+    for status in statuses:
+        # Boosts wrap the original status; ingest the original.
+        status = status.get("reblog") or status
+        if not should_keep_status(status):
+            continue
+
+        mapped = map_status(instance, hashtag, status)
+        deduped[mapped["external_id"]] = mapped
+
+    return list(deduped.values())
+
+
+@register_source
+class MastodonSource(Source):
+    name = "mastodon"
+    # Mastodon's default is 300 requests / 5 minutes per IP; stay far below it.
+    rate_per_minute = 30
+
+    def __init__(self, instances=None, hashtags=None, session=None):
+        super().__init__(session=session)
+        self.instances = instances or INSTANCES
+        self.hashtags = hashtags or HASHTAGS
+
+    def iter_batches(self):
+        for instance in self.instances:
+            for hashtag in self.hashtags:
+                yield f"{instance} #{hashtag}", fetch_hashtag_statuses(self, instance, hashtag)
+
+
+def main():
+    print("Starting Mastodon Collection...")
+    with spooled_writer() as writer:
+        MastodonSource().run(writer)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+import argparse
+import json
+import os
+import threading
+import time
+
+from collectors.base import fetch_json_with_backoff, get_http_session
+from collectors.mastodon_collector import HASHTAGS, TIMELINE_LIMIT, map_status, should_keep_status
+from collectors.spool import SPOOL_DIR, spooled_writer
+
+MASTODON_INSTANCE = os.environ.get("MASTODON_INSTANCE", "mastodon.social")
+MASTODON_ACCESS_TOKEN = os.environ.get("MASTODON_ACCESS_TOKEN")
+# Per-hashtag resume cursors, kept next to the spool so a restart backfills what it missed.
+CURSOR_PATH = os.environ.get("MASTODON_CURSOR_PATH", os.path.join(SPOOL_DIR, "mastodon_stream_cursors.json"))
+
+BATCH_SIZE = 50
+FLUSH_INTERVAL_SECONDS = 30
+# Mastodon sends a ":thump" heartbeat every ~10s; silence longer than this means a dead socket.
+READ_TIMEOUT_SECONDS = 90
+MAX_RECONNECT_BACKOFF = 60
+
+STATUS_EVENTS = {"update", "status.update"}
+
+
+class CursorStore:
+    """Last processed status id per hashtag, persisted as a small JSON file."""
+
+    def __init__(self, path=CURSOR_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except ValueError as exc:
+            print(f"Ignoring unreadable cursor file {self.path}: {exc}")
+            return {}
+
+    def save(self, cursors):
+        with self._lock:
+            merged = {**self.load(), **cursors}
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(merged, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+
+
+class MicroBatcher:
+    """
+    Buffers rows from every stream and upserts them once `batch_size` or
+    `flush_interval` is hit. Hashtag cursors advanced since the last flush
+    are saved to `cursors` only after that flush's rows are written.
+    """
+
+    def __init__(self, writer, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL_SECONDS, cursors=None):
+        self.writer = writer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.cursors = cursors
+        self._lock = threading.Lock()
+        self._rows = {}
+        self._pending_cursors = {}
+        self._oldest_at = None
+
+    def add(self, row):
+        with self._lock:
+            if self._oldest_at is None:
+                self._oldest_at = time.monotonic()
+            self._rows[(row["source_platform"], row["external_id"])] = row
+        self.maybe_flush()
+
+    def advance(self, hashtag, status_id):
+        """Record that every status up to `status_id` on `hashtag` has been buffered."""
+        if self.cursors is None:
+            return
+        with self._lock:
+            if self._oldest_at is None:
+                self._oldest_at = time.monotonic()
+            self._pending_cursors[hashtag] = status_id
+
+    def maybe_flush(self):
+        with self._lock:
+            if self._oldest_at is None:
+                return
+            age = time.monotonic() - self._oldest_at
+            if len(self._rows) < self.batch_size and age < self.flush_interval:
+                return
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            rows, cursors = self._rows, self._pending_cursors
+            self._rows, self._pending_cursors = {}, {}
+            self._oldest_at = None
+        if not rows and not cursors:
+            return
+        try:
+            if rows:
+                self.writer.write(list(rows.values()), "mastodon stream")
+        except Exception:
+            # Put the batch back (newer copies win) so the next flush retries it.
+            with self._lock:
+                rows.update(self._rows)
+                cursors.update(self._pending_cursors)
+                self._rows, self._pending_cursors = rows, cursors
+                self._oldest_at = self._oldest_at or time.monotonic()
+            raise
+        if cursors:
+            self.cursors.save(cursors)
+
+
+def iter_sse_events(lines):
+    """Yield (event, data) pairs from an iterator of decoded SSE lines. Heartbeats yield (None, None)."""
+    event, data = None, []
+    for line in lines:
+        if line is None:
+            continue
+        if line.startswith(":"):
+            yield None, None
+            continue
+        if not line:
+            if event or data:
+                yield event, "\n".join(data)
+            event, data = None, []
+            continue
+
+        field, _, value = line.partition(":")
+        value = value[1:] if value.startswith(" ") else value
+        if field == "event":
+            event = value
+        elif field == "data":
+            data.append(value)
+
+
+def resolve_streaming_url(base_url, session=None):
+    """
+    The instance's streaming API base from /api/v2/instance. Large instances
+    serve it from a separate host; the web host only redirects there, and
+    requests drops the Authorization header on a cross-host redirect.
+    Falls back to `base_url` if the instance does not advertise one.
+    """
+    instance = fetch_json_with_backoff(f"{base_url}/api/v2/instance", session=session) or {}
+    streaming = ((instance.get("configuration") or {}).get("urls") or {}).get("streaming")
+    if not streaming:
+        print(f"No streaming URL advertised by {base_url}; streaming from the web host.")
+        return base_url
+    # Advertised as a websocket URL; the SSE endpoints live on the same host.
+    for ws, http in (("wss://", "https://"), ("ws://", "http://")):
+        if streaming.startswith(ws):
+            streaming = http + streaming[len(ws):]
+    return streaming.rstrip("/")
+
+
+class HashtagStream:
+    """
+    One streaming connection for a hashtag. Every connect, including the
+    first after a restart, backfills from the last saved cursor with min_id.
+    """
+
+    def __init__(self, instance, hashtag, batcher, base_url=None, access_token=None, session=None,
+                 streaming_url=None, last_id=None):
+        self.instance = instance
+        self.hashtag = hashtag
+        self.batcher = batcher
+        self.base_url = (base_url or f"https://{instance}").rstrip("/")
+        self.streaming_url = streaming_url
+        self.session = session or get_http_session()
+        self.headers = {"Authorization": f"Bearer {access_token}"} if access_token else {}
+        self.last_id = last_id
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def handle_status(self, status):
+        original = status.get("reblog") or status
+        try:
+            row = map_status(self.instance, self.hashtag, original) if should_keep_status(original) else None
+        except (KeyError, TypeError, ValueError) as exc:
+            # A malformed status will not get better on retry; skip it.
+            print(f"Skipping unreadable status {status.get('id')} on #{self.hashtag}: {exc!r}")
+            row = None
+        if row is not None:
+            self.batcher.add(row)
+
+        # Advance the resume cursor only once the status is buffered, so a
+        # writer failure replays it on reconnect. Ids sort numerically.
+        status_id = status.get("id")
+        if status_id and (self.last_id is None or int(status_id) > int(self.last_id)):
+            self.last_id = status_id
+            self.batcher.advance(self.hashtag, status_id)
+
+    def backfill(self):
+        """
+        Replay whatever was posted while disconnected, oldest first. Pages
+        forward with min_id until caught up; raises if a page cannot be
+        fetched so `run()` retries instead of skipping the gap.
+        """
+        if self.last_id is None:
+            return
+
+        while True:
+            cursor = self.last_id
+            statuses = fetch_json_with_backoff(
+                f"{self.base_url}/api/v1/timelines/tag/{self.hashtag}",
+                headers=self.headers,
+                params={"min_id": cursor, "limit": TIMELINE_LIMIT},
+                session=self.session,
+            )
+            if statuses is None:
+                raise ConnectionError(f"backfill for #{self.hashtag} after id {cursor} failed")
+            # min_id returns the page right after the cursor, newest first.
+            for status in reversed(statuses):
+                self.handle_status(status)
+            if not statuses or self.last_id == cursor:
+                return
+
+    def consume(self):
+        if self.streaming_url is None:
+            self.streaming_url = resolve_streaming_url(self.base_url, self.session)
+        with self.session.get(
+            f"{self.streaming_url}/api/v1/streaming/hashtag",
+            headers={**self.headers, "Accept": "text/event-stream"},
+            params={"tag": self.hashtag},
+            stream=True,
+            timeout=(10, READ_TIMEOUT_SECONDS),
+        ) as response:
+            response.raise_for_status()
+            print(f"Streaming #{self.hashtag} from {self.streaming_url}")
+            # Backfill only once the stream is open: anything posted meanwhile
+            # is buffered on the socket, so there is no window between the two.
+            self.backfill()
+            # text/event-stream carries no charset, and requests would otherwise assume latin-1.
+            response.encoding = "utf-8"
+            lines = response.iter_lines(decode_unicode=True)
+            for event, data in iter_sse_events(lines):
+                if self._stop.is_set():
+                    return
+                if event in STATUS_EVENTS and data:
+                    self.handle_status(json.loads(data))
+                self.batcher.maybe_flush()
+
+    def run(self):
+        attempt = 0
+        while not self._stop.is_set():
+            try:
+                self.consume()
+                attempt = 0
+            except Exception as exc:
+                # Any failure (network, bad payload, writer) reconnects rather than
+                # silently ending this hashtag's thread.
+                print(f"Stream #{self.hashtag} dropped: {exc!r}")
+
+            if self._stop.is_set():
+                break
+            backoff = min(2 ** attempt, MAX_RECONNECT_BACKOFF)
+            attempt += 1
+            print(f"Reconnecting #{self.hashtag} in {backoff}s (resuming after id {self.last_id})...")
+            self._stop.wait(backoff)
+
+
+def run_streams(hashtags=None, instance=MASTODON_INSTANCE, base_url=None,
+                access_token=MASTODON_ACCESS_TOKEN, writer=None,
+                batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL_SECONDS, cursor_path=CURSOR_PATH):
+    """Stream every hashtag until interrupted; `base_url` can point at a local fake server."""
+    if writer is None:
+        with spooled_writer() as spool:
+            return run_streams(hashtags, instance, base_url, access_token, spool, batch_size, flush_interval,
+                               cursor_path)
+
+    cursors = CursorStore(cursor_path)
+    saved = cursors.load()
+    batcher = MicroBatcher(writer, batch_size, flush_interval, cursors=cursors)
+
+    base_url = (base_url or f"https://{instance}").rstrip("/")
+    session = get_http_session()
+    streaming_url = resolve_streaming_url(base_url, session)
+    streams = [
+        HashtagStream(instance, tag, batcher, base_url=base_url, access_token=access_token, session=session,
+                      streaming_url=streaming_url, last_id=saved.get(tag))
+        for tag in (hashtags or HASHTAGS)
+    ]
+    threads = [threading.Thread(target=s.run, name=f"mastodon-{s.hashtag}", daemon=True) for s in streams]
+    for t in threads:
+        t.start()
+
+    try:
+        while any(t.is_alive() for t in threads):
+            time.sleep(1)
+            batcher.maybe_flush()
+    except KeyboardInterrupt:
+        print("Stopping Mastodon streams...")
+    finally:
+        for s in streams:
+            s.stop()
+        batcher.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Long-running Mastodon hashtag streaming collector.")
+    parser.add_argument("--instance", default=MASTODON_INSTANCE)
+    parser.add_argument("--base-url", help="Override the instance URL (e.g. a local fake server).")
+    parser.add_argument("--hashtags", help="Comma-separated hashtags (default: collector HASHTAGS).")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--flush-interval", type=float, default=FLUSH_INTERVAL_SECONDS)
+    parser.add_argument("--cursor-path", default=CURSOR_PATH, help="Where per-hashtag resume cursors are kept.")
+    args = parser.parse_args()
+
+    hashtags = [t.strip().lstrip("#") for t in args.hashtags.split(",") if t.strip()] if args.hashtags else None
+
+    print("Starting Mastodon Streaming Collection...")
+    run_streams(
+        hashtags=hashtags,
+        instance=args.instance,
+        base_url=args.base_url,
+        batch_size=args.batch_size,
+        flush_interval=args.flush_interval,
+        cursor_path=args.cursor_path,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+import functools
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from collectors.base import get_http_session
+
+# Opt-in: MEDIA_STAGE=1 enables hashing, MEDIA_EMBEDDINGS=1 adds a CLIP vector.
+MEDIA_STAGE_ENABLED = os.environ.get("MEDIA_STAGE") == "1"
+MEDIA_EMBEDDINGS_ENABLED = os.environ.get("MEDIA_EMBEDDINGS") == "1"
+MEDIA_CACHE_DIR = os.environ.get("MEDIA_CACHE_DIR", "media_cache")
+MEDIA_WORKERS = 8
+MAX_MEDIA_BYTES = 5 * 1024 * 1024
+# Smallest preview width that still carries enough detail for hashing/embedding.
+PREVIEW_MIN_WIDTH = 320
+
+# Misses that may be temporary (an HTML error page, a truncated download) are
+# retried after this long; oversized files are remembered for good.
+MISS_RETRY_SECONDS = 24 * 3600
+PERMANENT_MISSES = {"oversized"}
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".gif")
+
+_embed_lock = threading.Lock()
+_embed_model = None
+
+
+def pick_image_url(row):
+    """Prefer a small preview rendition over the full-size source to keep downloads cheap."""
+    post = row.get("raw_data") or {}
+    preview_images = ((post.get("preview") or {}).get("images") or [])
+    if preview_images:
+        resolutions = preview_images[0].get("resolutions") or []
+        for res in resolutions:
+            if res.get("width", 0) >= PREVIEW_MIN_WIDTH and res.get("url"):
+                return res["url"].replace("&amp;", "&")
+        if resolutions and resolutions[-1].get("url"):
+            return resolutions[-1]["url"].replace("&amp;", "&")
+
+    metadata = row.get("metadata") or {}
+    for candidate in (metadata.get("thumbnail"), metadata.get("media_url")):
+        if candidate and candidate.startswith("http"):
+            path = candidate.split("?", 1)[0].lower()
+            if path.endswith(IMAGE_EXTENSIONS) or "preview.redd.it" in candidate:
+                return candidate
+    return None
+
+
+def _url_key(url):
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+def _cache_path(cache_dir, kind, key, ext="json"):
+    return os.path.join(cache_dir, kind, key[:2], f"{key}.{ext}")
+
+
+def _read_json(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _write_json(path, payload):
+    _write_atomic(path, json.dumps(payload).encode("utf-8"))
+
+
+def _read_bytes(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def download_image(session, url, max_bytes=None):
+    """
+    Stream an image, giving up as soon as it exceeds `max_bytes`. Returns
+    (data, None) or (None, miss_reason); network errors propagate.
+    """
+    max_bytes = max_bytes or MAX_MEDIA_BYTES
+    with session.get(url, stream=True, timeout=15) as response:
+        response.raise_for_status()
+        if not response.headers.get("Content-Type", "").startswith("image/"):
+            return None, "not_image"
+        if int(response.headers.get("Content-Length") or 0) > max_bytes:
+            return None, "oversized"
+
+        chunks, size = [], 0
+        for chunk in response.iter_content(64 * 1024):
+            size += len(chunk)
+            if size > max_bytes:
+                return None, "oversized"
+            chunks.append(chunk)
+        return b"".join(chunks), None
+
+
+def _miss_is_fresh(entry):
+    if entry.get("reason") in PERMANENT_MISSES:
+        return True
+    return time.time() - entry.get("at", 0) < MISS_RETRY_SECONDS
+
+
+def _bits_to_hex(bits):
+    value = 0
+    for bit in bits.flatten():
+        value = (value << 1) | int(bit)
+    return f"{value:016x}"
+
+
+@functools.lru_cache(maxsize=None)
+def _dct_matrix(n):
+    import numpy as np
+
+    k = np.arange(n)
+    matrix = np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * n))
+    matrix[0] *= 1 / np.sqrt(2)
+    return matrix * np.sqrt(2 / n)
+
+
+def perceptual_hashes(image):
+    """64-bit pHash (DCT) and dHash (gradient) as hex strings; compare with Hamming distance."""
+    # numpy and Pillow load lazily so collectors don't need them with MEDIA_STAGE off.
+    import numpy as np
+    from PIL import Image
+
+    gray = image.convert("L")
+
+    dct_32 = _dct_matrix(32)
+    small = np.asarray(gray.resize((32, 32), Image.LANCZOS), dtype=np.float64)
+    dct = dct_32 @ small @ dct_32.T
+    low = dct[:8, :8]
+    phash = low > np.median(low.flatten()[1:])
+
+    diff = np.asarray(gray.resize((9, 8), Image.LANCZOS), dtype=np.int16)
+    dhash = diff[:, 1:] > diff[:, :-1]
+
+    return _bits_to_hex(phash), _bits_to_hex(dhash)
+
+
+def image_embedding(image):
+    """Small CPU CLIP embedding, loaded on first use."""
+    global _embed_model
+    with _embed_lock:
+        if _embed_model is None:
+            from sentence_transformers import SentenceTransformer
+
+            _embed_model = SentenceTransformer("clip-ViT-B-32", device="cpu")
+        vector = _embed_model.encode(image.convert("RGB"))
+    return [round(float(x), 5) for x in vector]
+
+
+def analyze_image(data, with_embedding=False):
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as image:
+        # Read before draft(), which shrinks the reported size along with the decode.
+        width, height = image.size
+        # draft() lets JPEG decode at reduced scale, which is all hashing needs.
+        image.draft("RGB", (256, 256))
+        image.load()
+        phash, dhash = perceptual_hashes(image)
+        features = {
+            "phash": phash,
+            "dhash": dhash,
+            "width": width,
+            "height": height,
+        }
+        if with_embedding:
+            features["embedding"] = image_embedding(image)
+    return features
+
+
+class MediaStage:
+    """
+    Fetches one image per post with bounded parallelism and stores its
+    perceptual hashes in `metadata["media_features"]`. The URL index, image
+    bytes and features are cached on disk, the latter two by content hash, so
+    a repost is fetched and processed once.
+    """
+
+    def __init__(self, cache_dir=MEDIA_CACHE_DIR, workers=MEDIA_WORKERS,
+                 with_embedding=MEDIA_EMBEDDINGS_ENABLED, session=None):
+        self.cache_dir = cache_dir
+        self.workers = workers
+        self.with_embedding = with_embedding
+        self.session = session or get_http_session()
+
+    def features_for_url(self, url):
+        url_path = _cache_path(self.cache_dir, "urls", _url_key(url))
+        cached = _read_json(url_path)
+        data = None
+        if cached is not None and cached.get("sha256"):
+            sha256 = cached["sha256"]
+            features = _read_json(_cache_path(self.cache_dir, "content", sha256))
+            if features and (not self.with_embedding or "embedding" in features):
+                return features
+            data = _read_bytes(_cache_path(self.cache_dir, "images", sha256, "img"))
+        elif cached is not None and _miss_is_fresh(cached):
+            return None
+
+        if data is None:
+            try:
+                data, miss_reason = download_image(self.session, url)
+            except requests.RequestException as exc:
+                print(f"Media fetch failed for {url}: {exc}")
+                return None
+            if data is None:
+                self._remember_miss(url_path, miss_reason)
+                return None
+
+        sha256 = hashlib.sha256(data).hexdigest()
+        image_path = _cache_path(self.cache_dir, "images", sha256, "img")
+        if not os.path.exists(image_path):
+            _write_atomic(image_path, data)
+
+        content_path = _cache_path(self.cache_dir, "content", sha256)
+        features = _read_json(content_path)
+        if features is None or (self.with_embedding and "embedding" not in features):
+            try:
+                features = {"sha256": sha256, **analyze_image(data, self.with_embedding)}
+            except Exception as exc:
+                print(f"Media decode failed for {url}: {exc}")
+                # Could be a truncated download; drop the bytes and retry after the TTL.
+                os.remove(image_path)
+                self._remember_miss(url_path, "undecodable")
+                return None
+            _write_json(content_path, features)
+
+        _write_json(url_path, {"sha256": sha256})
+        return features
+
+    def _remember_miss(self, url_path, reason):
+        """Avoid refetching every run; only `PERMANENT_MISSES` are never retried."""
+        _write_json(url_path, {"sha256": None, "reason": reason, "at": time.time()})
+
+    def enrich(self, rows):
+        """Attach media features to rows in place; returns how many rows got features."""
+        try:
+            import numpy  # noqa: F401
+            import PIL  # noqa: F401
+        except ImportError:
+            print("Pillow/numpy not installed; skipping media stage.")
+            return 0
+
+        rows_by_url = {}
+        for row in rows:
+            url = pick_image_url(row)
+            if url:
+                rows_by_url.setdefault(url, []).append(row)
+
+        if not rows_by_url:
+            return 0
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            results = dict(zip(rows_by_url, pool.map(self.features_for_url, rows_by_url)))
+
+        enriched = 0
+        for url, features in results.items():
+            if not features:
+                continue
+            for row in rows_by_url[url]:
+                row["metadata"]["media_features"] = {"source_url": url, **features}
+                enriched += 1
+        return enriched
@@ -1,13 +1,11 @@
-import os
-import re
-import time
-from datetime import datetime, timezone
+import argparse
+import json
+from datetime import datetime, timedelta, timezone
 
-import dotenv
-import requests
-from supabase import create_client
-
-dotenv.load_dotenv()
+from collectors.base import SOCIAL_INPUTS_TABLE, SocialInputWriter, Source, get_supabase, register_source
+from collectors.filters import is_relevant_text
+from collectors.media import MEDIA_STAGE_ENABLED, MediaStage
+from collectors.spool import spooled_writer
 
 # Config
 SUBREDDITS = [
@@ -31,208 +29,317 @@ FETCH_VARIANTS = [
     ("new", {"limit": 100}),
 ]
 
-KEYWORD_PATTERNS = [
-    r"\boverlay(?:s)?\b",
-    r"\bwidget(?:s)?\b",
-    r"\bhud\b",
-    r"\btheme(?:s)?\b",
-    r"\baesthetic(?:s)?\b",
-    r"\bplugin(?:s)?\b",
-    r"\btransition(?:s)?\b",
-    r"\bstinger(?:s)?\b",
-    r"\balert(?:s)?\b",
-    r"\bchat\s?box(?:es)?\b",
-    r"\bpanel(?:s)?\b",
-    r"\bcozy\b",
-    r"\bcyberpunk\b",
-    r"\boutrun\b",
-    r"\bretro\b",
-    r"\bpixel\b",
-    r"\bsetup(?:s)?\b",
-    r"\bstation(?:s)?\b",
-    r"\bdesk(?:s)?\b",
-    r"\broom(?:s)?\b",
-    r"\bvibe(?:s)?\b",
-    r"\blayout(?:s)?\b",
-    r"\brebrand(?:ing)?\b",
-    r"\basset(?:s)?\b",
-    r"\bdesign(?:s|er)?\b",
-    r"\bvtuber\smodel(?:s)?\b",
-    r"\bemote(?:s)?\b",
-    r"\bbadge(?:s)?\b",
-    r"\bshowcase\b",
-    r"\binspiration\b",
-]
-
-# Only high-signal support/problem terms to reduce false negatives.
-BLACKLIST_PATTERNS = [
-    r"\berror(?:s)?\b",
-    r"\bcrash(?:es|ed|ing)?\b",
-    r"\bbug(?:s)?\b",
-    r"\bbroken\b",
-    r"\bhow\s+to\s+fix\b",
-    r"\bbitrate\b",
-    r"\bdropped\s+frames?\b",
-    r"\bstutter(?:ing)?\b",
-    r"\bdisconnect(?:ed|ion|ing)?\b",
-    r"\blogin\b",
-    r"\bpassword\b",
-    r"\bdriver(?:s)?\b",
-    r"\bblack\s+screen\b",
-    r"\bblue\s+screen\b",
-]
-
-KEYWORD_REGEX = re.compile("|".join(KEYWORD_PATTERNS), re.IGNORECASE)
-BLACKLIST_REGEX = re.compile("|".join(BLACKLIST_PATTERNS), re.IGNORECASE)
+# Engagement refresh: /api/info accepts up to 100 fullnames per call.
+INFO_URL = "https://www.reddit.com/api/info.json"
+INFO_BATCH_SIZE = 100
+REFRESH_DAYS = 3
+DB_PAGE_SIZE = 1000
 
-SUPABASE_URL = os.environ.get("SUPABASE_URL")
-SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+def _unescape(url):
+    return url.replace("&amp;", "&") if url else None
 
 
-def get_best_media_url(post):
-    """Pick the best available media URL for downstream visual analysis."""
-    gallery_metadata = post.get("media_metadata") or {}
-    if post.get("is_gallery") and gallery_metadata:
-        for media in gallery_metadata.values():
+def resolve_media_urls(post):
+    """
+    One pass over `media_metadata`/`preview`: returns (media_url, preview_url),
+    where media_url is the best URL for downstream visual analysis.
+    """
+    gallery_url = None
+    if post.get("is_gallery"):
+        for media in (post.get("media_metadata") or {}).values():
             source = media.get("s") if isinstance(media, dict) else None
-            candidate = source.get("u") if source else None
-            if candidate:
-                return candidate.replace("&amp;", "&")
+            gallery_url = _unescape(source.get("u") if source else None)
+            if gallery_url:
+                break
 
+    preview_url = None
     preview_images = ((post.get("preview") or {}).get("images") or [])
     if preview_images:
-        source = preview_images[0].get("source") or {}
-        preview_url = source.get("url")
-        if preview_url:
-            return preview_url.replace("&amp;", "&")
+        preview_url = _unescape((preview_images[0].get("source") or {}).get("url"))
 
-    for field in ("url_overridden_by_dest", "url"):
-        candidate = post.get(field)
-        if candidate:
-            return candidate
+    media_url = gallery_url or preview_url or post.get("url_overridden_by_dest") or post.get("url") or None
+    return media_url, preview_url
 
-    return None
 
+def get_best_media_url(post):
+    """Pick the best available media URL for downstream visual analysis."""
+    return resolve_media_urls(post)[0]
 
-def fetch_json_with_backoff(url, headers, params, max_retries=4):
-    for attempt in range(max_retries):
-        try:
-            response = requests.get(url, headers=headers, params=params, timeout=15)
-            if response.status_code == 429:
-                backoff = min(2 ** attempt, 16)
-                print(f"Rate limited on {url} with params={params}. Retrying in {backoff}s...")
-                time.sleep(backoff)
-                continue
 
-            response.raise_for_status()
-            return response.json()
-        except requests.RequestException as exc:
-            if attempt == max_retries - 1:
-                print(f"Request failed for {url} params={params}: {exc}")
-                return None
-            backoff = min(2 ** attempt, 16)
-            print(f"Request error for {url} params={params}: {exc}. Retrying in {backoff}s...")
-            time.sleep(backoff)
-    return None
+def should_keep_post(subreddit, full_text):
+    return is_relevant_text(full_text, always_keep=subreddit in VISUAL_SUBS)
+
+
+_DECODER = json.JSONDecoder()
+
+
+def iter_listing_children(text):
+    """
+    Yield each child's `data` dict from an already-downloaded listing body,
+    one at a time, so the decoded listing tree is never held at once. The
+    body text itself is fully in memory and each child is fully decoded
+    before the caller filters it. Raises ValueError on a body that is not a
+    listing or is truncated or malformed.
+    """
+    start = text.find('"children"')
+    pos = text.find("[", start) + 1 if start != -1 else 0
+    if pos == 0:
+        raise ValueError("no listing children in response body")
+
+    decode = _DECODER.raw_decode
+    end = len(text)
+    while pos < end:
+        char = text[pos]
+        if char in " \t\r\n,":
+            pos += 1
+            continue
+        if char == "]":
+            return
+        child, pos = decode(text, pos)
+        yield child.get("data", {})
+    raise ValueError("listing children truncated")
+
+
+class RedditPost:
+    """Compact kept-post record; expanded into a `social_inputs` row only at write time."""
+
+    __slots__ = (
+        "external_id", "subreddit", "fetch_variant", "title", "content", "permalink",
+        "created_utc", "score", "num_comments", "upvote_ratio", "is_self", "post_hint",
+        "is_gallery", "media_url", "media_type", "thumbnail", "url_overridden_by_dest",
+        "raw_json",
+    )
+
+    def __init__(self, subreddit, fetch_variant, post):
+        media_url, preview_url = resolve_media_urls(post)
+        post_hint = post.get("post_hint")
+
+        media_type = "text"
+        if post.get("is_gallery"):
+            media_type = "gallery"
+        elif post_hint in {"image", "link", "hosted:video", "rich:video"}:
+            media_type = post_hint
+        elif media_url:
+            media_type = "media"
+
+        self.external_id = post["id"]
+        self.subreddit = subreddit
+        self.fetch_variant = fetch_variant
+        self.title = post.get("title", "")
+        self.content = post.get("selftext", "")[:2000]
+        self.permalink = post.get("permalink", "")
+        self.created_utc = post["created_utc"]
+        self.score = post.get("score", 0)
+        self.num_comments = post.get("num_comments", 0)
+        self.upvote_ratio = post.get("upvote_ratio", 0)
+        self.is_self = post.get("is_self", False)
+        self.post_hint = post_hint
+        self.is_gallery = post.get("is_gallery", False)
+        self.media_url = media_url
+        self.media_type = media_type
+        self.thumbnail = preview_url or post.get("thumbnail")
+        self.url_overridden_by_dest = post.get("url_overridden_by_dest")
+        # Kept as encoded JSON rather than the nested dict; it is the bulk of each post.
+        self.raw_json = json.dumps(post)
+
+    def _row_without_raw(self):
+        return {
+            "source_platform": "reddit",
+            "external_id": self.external_id,
+            "title": self.title,
+            "content": self.content,
+            "url": f"https://reddit.com{self.permalink}",
+            "author_name": f"r/{self.subreddit}",
+            "posted_at": datetime.fromtimestamp(self.created_utc, tz=timezone.utc).isoformat(),
+            "engagement_score": self.score + self.num_comments,
+            "metadata": {
+                "subreddit": self.subreddit,
+                "fetch_variant": self.fetch_variant,
+                "upvotes": self.score,
+                "comments": self.num_comments,
+                "upvote_ratio": self.upvote_ratio,
+                "is_self": self.is_self,
+                "post_hint": self.post_hint,
+                "is_gallery": self.is_gallery,
+                "media_url": self.media_url,
+                "media_type": self.media_type,
+                "thumbnail": self.thumbnail,
+                "url_overridden_by_dest": self.url_overridden_by_dest,
+            },
+        }
+
+    def to_row(self):
+        row = self._row_without_raw()
+        row["raw_data"] = json.loads(self.raw_json)
+        return row
+
+    def to_json(self):
+        """Spool line with `raw_data` spliced in verbatim, skipping a decode/encode round trip."""
+        head = json.dumps(self._row_without_raw(), default=str)
+        return f'{head[:-1]}, "raw_data": {self.raw_json}}}'
 
 
-def should_keep_post(subreddit, full_text):
-    is_visual_sub = subreddit in VISUAL_SUBS
+def map_post(subreddit, fetch_variant, post):
+    return RedditPost(subreddit, fetch_variant, post).to_row()
 
-    if BLACKLIST_REGEX.search(full_text):
-        return False
 
-    if is_visual_sub:
-        return True
+def parse_listing(subreddit, fetch_variant, text, deduped):
+    """Filter each decoded child on title/selftext and keep only matching posts as RedditPost."""
+    for post in iter_listing_children(text):
+        if not should_keep_post(subreddit, f"{post.get('title', '')} {post.get('selftext', '')}"):
+            continue
+        deduped[post["id"]] = RedditPost(subreddit, fetch_variant, post)
+    return deduped
 
-    return bool(KEYWORD_REGEX.search(full_text))
 
+def fetch_reddit_posts(source, subreddit):
+    base_url = f"https://www.reddit.com/r/{subreddit}"
 
-def map_post(subreddit, fetch_variant, post):
-    posted_at = datetime.fromtimestamp(post["created_utc"], tz=timezone.utc).isoformat()
-    media_url = get_best_media_url(post)
-    post_hint = post.get("post_hint")
+    deduped = {}
+    for listing, params in FETCH_VARIANTS:
+        listing_url = f"{base_url}/{listing}.json"
+        text = source.fetch_text(listing_url, params=params, content_type="application/json")
+        if not text:
+            continue
 
-    media_type = "text"
-    if post.get("is_gallery"):
-        media_type = "gallery"
-    elif post_hint in {"image", "link", "hosted:video", "rich:video"}:
-        media_type = post_hint
-    elif media_url:
-        media_type = "media"
+        try:
+            parse_listing(subreddit, listing, text, deduped)
+        except ValueError as exc:
+            # Posts decoded before the bad spot are kept; the rest of this listing is skipped.
+            print(f"Malformed {listing} listing for r/{subreddit}: {exc}")
 
-    preview_images = ((post.get("preview") or {}).get("images") or [])
-    thumbnail = None
-    if preview_images:
-        thumbnail = ((preview_images[0].get("source") or {}).get("url") or "").replace("&amp;", "&") or None
+    return list(deduped.values())
+
+
+@register_source
+class RedditSource(Source):
+    name = "reddit"
+    # Roughly the pace of the old fixed 2s sleep between subreddits.
+    rate_per_minute = 30
+
+    def __init__(self, subreddits=None, media_stage=None, session=None):
+        super().__init__(session=session)
+        self.subreddits = subreddits or SUBREDDITS
+        if media_stage is None and MEDIA_STAGE_ENABLED:
+            media_stage = MediaStage(session=self.session)
+        self.media_stage = media_stage
+
+    def iter_batches(self):
+        for sub in self.subreddits:
+            posts = fetch_reddit_posts(self, sub)
+            # Visual subs carry their signal in the image, not "my new setup".
+            if self.media_stage and sub in VISUAL_SUBS and posts:
+                posts = [post.to_row() for post in posts]
+                enriched = self.media_stage.enrich(posts)
+                print(f"Hashed media for {enriched}/{len(posts)} posts from r/{sub}")
+            yield f"r/{sub}", posts
+
+
+def load_recent_reddit_rows(client, days):
+    """
+    Full stored rows for Reddit posts from the last `days` days, paged past
+    PostgREST's row cap. Whole rows are loaded so refreshed ones can be
+    upserted back in bulk without tripping NOT NULL checks on the insert path.
+    """
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+
+    rows = []
+    start = 0
+    while True:
+        response = client.table(SOCIAL_INPUTS_TABLE)\
+            .select("*")\
+            .eq("source_platform", "reddit")\
+            .gte("posted_at", cutoff)\
+            .range(start, start + DB_PAGE_SIZE - 1)\
+            .execute()
+        rows.extend(response.data)
+        if len(response.data) < DB_PAGE_SIZE:
+            return rows
+        start += DB_PAGE_SIZE
+
+
+def build_engagement_update(row, post):
+    """The stored row with fresh score/comment fields, or None if nothing moved."""
+    metadata = row.get("metadata") or {}
+    upvotes = post.get("score", 0)
+    comments = post.get("num_comments", 0)
+    if metadata.get("upvotes") == upvotes and metadata.get("comments") == comments:
+        return None
 
     return {
-        "source_platform": "reddit",
-        "external_id": post["id"],
-        "title": post.get("title", ""),
-        "content": post.get("selftext", "")[:2000],
-        "url": f"https://reddit.com{post.get('permalink', '')}",
-        "author_name": f"r/{subreddit}",
-        "posted_at": posted_at,
-        "engagement_score": post.get("score", 0) + post.get("num_comments", 0),
+        **row,
+        "engagement_score": upvotes + comments,
         "metadata": {
-            "subreddit": subreddit,
-            "fetch_variant": fetch_variant,
-            "upvotes": post.get("score", 0),
-            "comments": post.get("num_comments", 0),
-            "upvote_ratio": post.get("upvote_ratio", 0),
-            "is_self": post.get("is_self", False),
-            "post_hint": post_hint,
-            "is_gallery": post.get("is_gallery", False),
-            "media_url": media_url,
-            "media_type": media_type,
-            "thumbnail": thumbnail or post.get("thumbnail"),
-            "url_overridden_by_dest": post.get("url_overridden_by_dest"),
+            **metadata,
+            "upvotes": upvotes,
+            "comments": comments,
+            "upvote_ratio": post.get("upvote_ratio", metadata.get("upvote_ratio", 0)),
         },
-        "raw_data": post,
     }
 
 
-def fetch_reddit_posts(subreddit):
-    headers = {"User-Agent": "python:trend-hunter:v1.1 (by /u/ConfidentSession1009)"}
-    base_url = f"https://www.reddit.com/r/{subreddit}"
+class RedditEngagementRefresh(Source):
+    """
+    Re-fetches recently ingested posts through /api/info, 100 fullnames per
+    request, and yields only the rows whose engagement changed, as whole rows
+    so each batch is a single upsert. Not registered with the runner; run it
+    via `--refresh-days`.
+    """
 
-    deduped = {}
-    for listing, params in FETCH_VARIANTS:
-        listing_url = f"{base_url}/{listing}.json"
-        data = fetch_json_with_backoff(listing_url, headers, params)
-        if not data:
-            continue
+    name = "reddit_refresh"
+    rate_per_minute = RedditSource.rate_per_minute
 
-        for child in data.get("data", {}).get("children", []):
-            post = child.get("data", {})
-            full_text = f"{post.get('title', '')} {post.get('selftext', '')}".lower()
-            if not should_keep_post(subreddit, full_text):
+    def __init__(self, days=REFRESH_DAYS, client=None, session=None):
+        super().__init__(session=session)
+        self.days = days
+        self.client = client
+
+    def iter_batches(self):
+        try:
+            rows = load_recent_reddit_rows(self.client or get_supabase(), self.days)
+        except Exception as exc:
+            print(f"DB Error loading recent Reddit posts, skipping refresh: {exc}")
+            return
+
+        print(f"Refreshing engagement for {len(rows)} Reddit posts from the last {self.days} days...")
+
+        stored = {row["external_id"]: row for row in rows}
+        ids = list(stored)
+        for i in range(0, len(ids), INFO_BATCH_SIZE):
+            chunk = ids[i:i + INFO_BATCH_SIZE]
+            data = self.fetch_json(INFO_URL, params={"id": ",".join(f"t3_{pid}" for pid in chunk)})
+            if not data:
                 continue
 
-            mapped = map_post(subreddit, listing, post)
-            deduped[mapped["external_id"]] = mapped
+            updates = []
+            for child in data.get("data", {}).get("children", []):
+                post = child.get("data", {})
+                row = stored.get(post.get("id"))
+                update = build_engagement_update(row, post) if row else None
+                if update:
+                    updates.append(update)
 
-    return list(deduped.values())
+            yield f"engagement refresh batch {i // INFO_BATCH_SIZE + 1}", updates
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Collect Reddit posts or refresh their engagement.")
+    parser.add_argument(
+        "--refresh-days",
+        type=int,
+        help="Instead of crawling listings, refresh engagement for posts from the last N days.",
+    )
+    args = parser.parse_args()
+
+    if args.refresh_days:
+        print("Starting Reddit Engagement Refresh...")
+        RedditEngagementRefresh(days=args.refresh_days).run(SocialInputWriter())
+        return
+
     print("Starting Reddit Collection...")
-    for sub in SUBREDDITS:
-        posts = fetch_reddit_posts(sub)
-        if posts:
-            try:
-                supabase.table("social_inputs").upsert(
-                    posts,
-                    on_conflict="source_platform, external_id",
-                    ignore_duplicates=False,
-                ).execute()
-                print(f"Saved {len(posts)} posts from r/{sub}")
-            except Exception as exc:
-                print(f"DB Error for r/{sub}: {exc}")
-        time.sleep(2)
+    with spooled_writer() as writer:
+        RedditSource().run(writer)
 
 
 if __name__ == "__main__":
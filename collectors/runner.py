@@ -0,0 +1,78 @@
+import argparse
+import importlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from collectors.base import SOURCES, SocialInputWriter
+from collectors.spool import spooled_writer
+
+# Importing a plugin module registers its Source via @register_source.
+# A new source only needs its module added here.
+SOURCE_MODULES = [
+    "collectors.reddit_collector",
+    "collectors.youtube_collector",
+    "collectors.mastodon_collector",
+]
+
+
+def load_sources(names=None):
+    for module in SOURCE_MODULES:
+        importlib.import_module(module)
+
+    if not names:
+        return dict(SOURCES)
+
+    unknown = [n for n in names if n not in SOURCES]
+    if unknown:
+        raise ValueError(f"Unknown source(s): {', '.join(unknown)}. Available: {', '.join(SOURCES)}")
+    return {n: SOURCES[n] for n in names}
+
+
+def _run_source(cls, writer):
+    # Built on the worker so a source whose setup fails only fails that source.
+    return cls().run(writer)
+
+
+def run_sources(names=None, writer=None):
+    """Run every selected source concurrently in this process, sharing pools and the writer."""
+    source_classes = load_sources(names)
+    if writer is None:
+        with spooled_writer() as spool:
+            return run_sources(names, writer=spool)
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=len(source_classes) or 1) as pool:
+        futures = {pool.submit(_run_source, cls, writer): name for name, cls in source_classes.items()}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                results[name] = future.result()
+            except Exception as exc:
+                print(f"Source {name} failed: {exc}")
+                results[name] = 0
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run social collectors in a single process.")
+    parser.add_argument(
+        "--sources",
+        help="Comma-separated source names (default: all registered sources).",
+    )
+    parser.add_argument(
+        "--direct",
+        action="store_true",
+        help="Upsert straight to Supabase instead of going through the local spool.",
+    )
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.sources.split(",") if n.strip()] if args.sources else None
+
+    print("--- Starting Collection ---")
+    results = run_sources(names, writer=SocialInputWriter() if args.direct else None)
+    for name, saved in sorted(results.items()):
+        print(f"{name}: collected {saved} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+import argparse
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from collectors.base import SOCIAL_INPUTS_CONFLICT, SOCIAL_INPUTS_TABLE, get_supabase
+
+SPOOL_DIR = os.environ.get("SOCIAL_SPOOL_DIR", "spool")
+
+# Segment rotation: sealed segments are the unit the drainer uploads.
+SEGMENT_MAX_ROWS = 5000
+SEGMENT_MAX_AGE_SECONDS = 60
+
+# fsync batching: at most one fsync per this many rows or seconds.
+FSYNC_EVERY_ROWS = 500
+FSYNC_INTERVAL_SECONDS = 1.0
+
+DRAIN_BATCH_SIZE = 500
+DRAIN_INTERVAL_SECONDS = 5
+
+# Rows the DB rejects for good are parked here instead of blocking the spool.
+DEAD_LETTER_DIR = "dead"
+
+# SQLSTATE classes/codes and PostgREST request errors that will fail the same
+# way on every retry: data exceptions, integrity violations, bad columns/types.
+PERMANENT_SQLSTATE_CLASSES = ("22", "23")
+PERMANENT_ERROR_CODES = ("42703", "42804", "PGRST204")
+
+OPEN_SUFFIX = ".jsonl.open"
+SEALED_SUFFIX = ".jsonl"
+CHECKPOINT_SUFFIX = ".ckpt"
+# Held for the length of a drain pass so two drainers never upload the same segment.
+DRAIN_LOCK_NAME = ".drain.lock"
+
+
+def _to_json(row):
+    # Compact records can embed their raw payload verbatim instead of re-encoding it.
+    return row.to_json() if hasattr(row, "to_json") else json.dumps(row, default=str)
+
+
+def _fsync_dir(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _try_lock(f):
+    """Non-blocking exclusive flock on an open file; False if another holder has it."""
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+def seal_orphaned_segments(spool_dir=SPOOL_DIR):
+    """
+    Seal open segments left behind by crashed processes so they get drained.
+    A live writer holds an flock on its open segment, so any open segment we
+    can lock has no writer, whichever host or PID created it.
+    """
+    if not os.path.isdir(spool_dir):
+        return
+    for name in os.listdir(spool_dir):
+        if not name.endswith(OPEN_SUFFIX):
+            continue
+        path = os.path.join(spool_dir, name)
+        try:
+            with open(path, encoding="utf-8") as f:
+                if not _try_lock(f):
+                    continue
+                os.replace(path, path[: -len(OPEN_SUFFIX)] + SEALED_SUFFIX)
+        except FileNotFoundError:
+            continue
+
+
+class SpoolWriter:
+    """
+    Drop-in replacement for SocialInputWriter that appends rows to local
+    append-only JSONL segments instead of calling Supabase, so fetching never
+    waits on the DB. A Drainer uploads the sealed segments.
+    """
+
+    def __init__(self, spool_dir=SPOOL_DIR):
+        self.spool_dir = spool_dir
+        os.makedirs(spool_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._file = None
+        self._path = None
+        self._opened_at = 0.0
+        self._segment_rows = 0
+        self._unsynced_rows = 0
+        self._synced_at = 0.0
+        self.saved = 0
+        seal_orphaned_segments(spool_dir)
+
+    def _open_segment(self):
+        self._seq += 1
+        # Names sort chronologically so the drainer uploads in arrival order.
+        name = f"segment-{time.time_ns():020d}-{os.getpid()}-{self._seq:06d}{OPEN_SUFFIX}"
+        self._path = os.path.join(self.spool_dir, name)
+        self._file = open(self._path, "a", encoding="utf-8")
+        # Released when the file is closed; marks the segment as still being written.
+        fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        self._opened_at = time.monotonic()
+        self._synced_at = self._opened_at
+        self._segment_rows = 0
+        self._unsynced_rows = 0
+
+    def _fsync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced_rows = 0
+        self._synced_at = time.monotonic()
+
+    def _seal(self):
+        if self._file is None:
+            return
+        self._fsync()
+        # Rename before closing so the lock covers the segment until it is sealed.
+        os.replace(self._path, self._path[: -len(OPEN_SUFFIX)] + SEALED_SUFFIX)
+        self._file.close()
+        _fsync_dir(self.spool_dir)
+        self._file = None
+        self._path = None
+
+    def write(self, rows, label):
+        if not rows:
+            return 0
+
+        with self._lock:
+            if self._file is None:
+                self._open_segment()
+
+            self._file.write("".join(_to_json(row) + "\n" for row in rows))
+            self._segment_rows += len(rows)
+            self._unsynced_rows += len(rows)
+            self.saved += len(rows)
+
+            if (self._unsynced_rows >= FSYNC_EVERY_ROWS
+                    or time.monotonic() - self._synced_at >= FSYNC_INTERVAL_SECONDS):
+                self._fsync()
+            if self._segment_rows >= SEGMENT_MAX_ROWS:
+                self._seal()
+
+        print(f"Spooled {len(rows)} rows from {label}")
+        return len(rows)
+
+    def rotate_if_stale(self):
+        """Seal the current segment once it is old enough, so quiet sources still get drained."""
+        with self._lock:
+            if self._file is not None and time.monotonic() - self._opened_at >= SEGMENT_MAX_AGE_SECONDS:
+                self._seal()
+
+    def close(self):
+        with self._lock:
+            self._seal()
+
+
+def _read_checkpoint(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return int(f.read().strip() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+def _write_checkpoint(path, lines_done):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(str(lines_done))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _read_segment(path):
+    rows = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                # A torn trailing line from a crash mid-write; everything before it is intact.
+                print(f"Skipping unreadable line {len(rows) + 1} in {path}")
+                break
+    return rows
+
+
+def _upsert_batch(client, rows):
+    # Postgres refuses to upsert the same key twice in one statement, and
+    # PostgREST needs uniform columns, so dedupe and group by row shape.
+    deduped = {(r["source_platform"], r["external_id"]): r for r in rows}
+    shapes = {}
+    for row in deduped.values():
+        shapes.setdefault(tuple(sorted(row)), []).append(row)
+
+    for shaped_rows in shapes.values():
+        client.table(SOCIAL_INPUTS_TABLE).upsert(
+            shaped_rows,
+            on_conflict=SOCIAL_INPUTS_CONFLICT,
+            ignore_duplicates=False,
+        ).execute()
+
+
+def is_permanent_db_error(exc):
+    """True for errors a retry cannot fix (postgrest APIError carries the SQLSTATE/PGRST code)."""
+    code = str(getattr(exc, "code", "") or "")
+    return (
+        code[:2] in PERMANENT_SQLSTATE_CLASSES
+        or code in PERMANENT_ERROR_CODES
+        or code.startswith("PGRST1")
+    )
+
+
+class Drainer:
+    """
+    Uploads sealed spool segments oldest-first. Upserts are idempotent, and a
+    per-segment checkpoint records how many lines are done, so a crash or DB
+    outage only means the unfinished batch is retried later. Rows the DB
+    rejects permanently are isolated by splitting the batch and moved to
+    `dead/`, so one bad row never blocks the segments behind it.
+    """
+
+    def __init__(self, spool_dir=SPOOL_DIR, client=None, writer=None,
+                 batch_size=DRAIN_BATCH_SIZE, interval=DRAIN_INTERVAL_SECONDS):
+        self.spool_dir = spool_dir
+        self.client = client
+        self.writer = writer
+        self.batch_size = batch_size
+        self.interval = interval
+        self.uploaded = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sealed_segments(self):
+        if not os.path.isdir(self.spool_dir):
+            return []
+        names = sorted(n for n in os.listdir(self.spool_dir) if n.endswith(SEALED_SUFFIX))
+        return [os.path.join(self.spool_dir, n) for n in names]
+
+    def drain_segment(self, path):
+        checkpoint = path + CHECKPOINT_SUFFIX
+        done = _read_checkpoint(checkpoint)
+        rows = _read_segment(path)
+
+        client = self.client or get_supabase()
+        while done < len(rows):
+            batch = rows[done:done + self.batch_size]
+            self.uploaded += self._upsert_or_isolate(client, batch, path)
+            done += len(batch)
+            _write_checkpoint(checkpoint, done)
+
+        os.remove(path)
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+
+    def _upsert_or_isolate(self, client, rows, segment_path):
+        """Upsert rows; on a permanent error, bisect until the rejected rows are dead-lettered."""
+        try:
+            _upsert_batch(client, rows)
+            return len(rows)
+        except Exception as exc:
+            if not is_permanent_db_error(exc):
+                raise
+            if len(rows) == 1:
+                self._dead_letter(segment_path, rows[0], exc)
+                return 0
+
+        mid = len(rows) // 2
+        return (self._upsert_or_isolate(client, rows[:mid], segment_path)
+                + self._upsert_or_isolate(client, rows[mid:], segment_path))
+
+    def _dead_letter(self, segment_path, row, exc):
+        dead_dir = os.path.join(self.spool_dir, DEAD_LETTER_DIR)
+        os.makedirs(dead_dir, exist_ok=True)
+        with open(os.path.join(dead_dir, os.path.basename(segment_path)), "a", encoding="utf-8") as f:
+            f.write(json.dumps({"error": str(exc), "row": row}, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        print(f"Dead-lettered {row.get('source_platform')}/{row.get('external_id')}: {exc}")
+
+    def drain_once(self):
+        """
+        Upload every sealed segment. A transient failure (network, 5xx) stops
+        the pass and keeps the rest for next time, since the DB is likely down.
+        The pass is skipped if another drainer holds the spool's drain lock.
+        """
+        if self.writer is not None:
+            self.writer.rotate_if_stale()
+        if not os.path.isdir(self.spool_dir):
+            return 0
+
+        with open(os.path.join(self.spool_dir, DRAIN_LOCK_NAME), "a") as lock:
+            if not _try_lock(lock):
+                return 0
+            drained = 0
+            for path in self.sealed_segments():
+                try:
+                    self.drain_segment(path)
+                except Exception as exc:
+                    print(f"Drain Error for {os.path.basename(path)}: {exc}")
+                    break
+                drained += 1
+            return drained
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.drain_once()
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="spool-drainer", daemon=True)
+        self._thread.start()
+
+    def stop(self, final_drain=True):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if final_drain:
+            if self.writer is not None:
+                self.writer.close()
+            self.drain_once()
+
+
+@contextmanager
+def spooled_writer(spool_dir=SPOOL_DIR):
+    """SpoolWriter with a background Drainer; leaving the block seals and drains what is left."""
+    writer = SpoolWriter(spool_dir)
+    drainer = Drainer(spool_dir, writer=writer)
+    drainer.start()
+    try:
+        yield writer
+    finally:
+        drainer.stop()
+        pending = len(drainer.sealed_segments())
+        if pending:
+            print(f"{pending} spool segment(s) left in {spool_dir} for the next drain.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upload spooled social_inputs rows to Supabase.")
+    parser.add_argument("--spool-dir", default=SPOOL_DIR)
+    parser.add_argument("--loop", action="store_true", help="Keep draining until interrupted.")
+    args = parser.parse_args()
+
+    seal_orphaned_segments(args.spool_dir)
+    drainer = Drainer(spool_dir=args.spool_dir)
+    if not args.loop:
+        drainer.drain_once()
+        print(f"Uploaded {drainer.uploaded} spooled rows.")
+        return
+
+    print("Starting Spool Drainer...")
+    try:
+        while True:
+            seal_orphaned_segments(args.spool_dir)
+            drainer.drain_once()
+            time.sleep(drainer.interval)
+    except KeyboardInterrupt:
+        print(f"Uploaded {drainer.uploaded} spooled rows.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,13 @@
 import os
-import re
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from supabase import create_client
-import dotenv
 
-dotenv.load_dotenv()
+from collectors.base import Source, register_source
+from collectors.filters import VIDEO_BLACKLIST_REGEX, VIDEO_KEYWORD_REGEX, is_relevant_text
+from collectors.spool import spooled_writer
 
 # --- CONFIGURATION ---
 YOUTUBE_API_KEY = os.environ.get("YOUTUBE_API_KEY")
-SUPABASE_URL = os.environ.get("SUPABASE_URL")
-SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
 
 # List of Channel IDs (Not the @name, the ID starting with UC)
 # These are top channels for Streaming Tech, OBS, and Desk Setups
@@ -27,52 +24,14 @@ TARGET_CHANNELS = [
     "UCATWC1JSlhzmYeDbjnS8WwA",  # Senpai Gaming
 ]
 
-KEYWORD_PATTERNS = [
-    r"\boverlay(?:s)?\b",
-    r"\bwidget(?:s)?\b",
-    r"\bhud\b",
-    r"\btheme(?:s)?\b",
-    r"\baesthetic(?:s)?\b",
-    r"\bplugin(?:s)?\b",
-    r"\bobs\b",
-    r"\btransition(?:s)?\b",
-    r"\bstinger(?:s)?\b",
-    r"\balert(?:s)?\b",
-    r"\bchat\s?box(?:es)?\b",
-    r"\bpanel(?:s)?\b",
-    r"\bsetup(?:s)?\b",
-    r"\bdesk(?:s)?\b",
-    r"\broom(?:s)?\b",
-    r"\btour(?:s)?\b",
-    r"\bvibe(?:s)?\b",
-    r"\bcozy\b",
-    r"\bminimal(?:ist)?\b",
-    r"\bcyberpunk\b",
-    r"\bretro\b",
-    r"\bpixel\b",
-]
-
-BLACKLIST_PATTERNS = [
-    r"\berror(?:s)?\b",
-    r"\bcrash(?:es|ed|ing)?\b",
-    r"\bbug(?:s)?\b",
-    r"\bfix(?:ing|ed)?\b",
-    r"\bbitrate\b",
-    r"\bdropped\s+frames?\b",
-    r"\bstutter(?:ing)?\b",
-]
-
-KEYWORD_REGEX = re.compile("|".join(KEYWORD_PATTERNS), re.IGNORECASE)
-BLACKLIST_REGEX = re.compile("|".join(BLACKLIST_PATTERNS), re.IGNORECASE)
-
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-
 
 def is_relevant_video(title, description):
     full_text = f"{title} {description}"
-    if BLACKLIST_REGEX.search(full_text):
-        return False
-    return bool(KEYWORD_REGEX.search(full_text))
+    return is_relevant_text(
+        full_text,
+        keyword_regex=VIDEO_KEYWORD_REGEX,
+        blacklist_regex=VIDEO_BLACKLIST_REGEX,
+    )
 
 
 def get_channel_uploads_id(youtube, channel_id):
@@ -131,83 +90,101 @@ def get_video_stats(youtube, video_ids):
     return stats
 
 
-def main():
-    if not YOUTUBE_API_KEY:
-        print("Error: YOUTUBE_API_KEY not found.")
-        return
-
-    print("--- Starting YouTube Collection ---")
-    youtube = build("youtube", "v3", developerKey=YOUTUBE_API_KEY)
-
-    all_videos = []
-
-    for channel_id in TARGET_CHANNELS:
-        try:
-            uploads_id, channel_name = get_channel_uploads_id(youtube, channel_id)
-            if not uploads_id:
+def map_video(channel_id, channel_name, v, stats):
+    vid = v["contentDetails"]["videoId"]
+
+    views = int(stats.get("viewCount", 0))
+    likes = int(stats.get("likeCount", 0))
+    comments = int(stats.get("commentCount", 0))
+
+    normalized_score = (views // 100) + likes + comments
+
+    return {
+        "source_platform": "youtube",
+        "external_id": vid,
+        "title": v["snippet"]["title"],
+        "content": v["snippet"].get("description", "")[:2000],
+        "url": f"https://www.youtube.com/watch?v={vid}",
+        "author_name": channel_name,
+        "posted_at": v["snippet"]["publishedAt"],
+        "engagement_score": normalized_score,
+        "metadata": {
+            "channel_id": channel_id,
+            "views": views,
+            "likes": likes,
+            "comments": comments,
+            "thumbnail": v["snippet"]["thumbnails"]["high"]["url"],
+        },
+        "raw_data": v,
+    }
+
+
+def fetch_channel_videos(source, youtube, channel_id):
+    source.budget.wait()
+    uploads_id, channel_name = get_channel_uploads_id(youtube, channel_id)
+    if not uploads_id:
+        return []
+
+    print(f"Checking {channel_name}...")
+
+    source.budget.wait()
+    videos = get_recent_videos(youtube, uploads_id, limit=12)
+
+    relevant_videos = []
+    for v in videos:
+        title = v["snippet"]["title"]
+        desc = v["snippet"].get("description", "")
+        if is_relevant_video(title, desc):
+            relevant_videos.append(v)
+
+    if not relevant_videos:
+        return []
+
+    video_ids = [v["contentDetails"]["videoId"] for v in relevant_videos]
+    source.budget.wait()
+    stats_map = get_video_stats(youtube, video_ids)
+
+    return [
+        map_video(channel_id, channel_name, v, stats_map.get(v["contentDetails"]["videoId"], {}))
+        for v in relevant_videos
+    ]
+
+
+@register_source
+class YouTubeSource(Source):
+    name = "youtube"
+    rate_per_minute = 60
+
+    def __init__(self, channels=None, api_key=None, session=None):
+        super().__init__(session=session)
+        self.channels = channels or TARGET_CHANNELS
+        self.api_key = api_key or YOUTUBE_API_KEY
+
+    def iter_batches(self):
+        if not self.api_key:
+            print("Error: YOUTUBE_API_KEY not found.")
+            return
+
+        # googleapiclient keeps its own transport; the client is not shared across threads.
+        youtube = build("youtube", "v3", developerKey=self.api_key)
+
+        for channel_id in self.channels:
+            try:
+                videos = fetch_channel_videos(self, youtube, channel_id)
+            except Exception as e:
+                print(f"Error processing {channel_id}: {e}")
                 continue
 
-            print(f"Checking {channel_name}...")
-
-            videos = get_recent_videos(youtube, uploads_id, limit=12)
+            if videos:
+                yield f"YouTube channel {channel_id}", videos
 
-            relevant_videos = []
-            for v in videos:
-                title = v["snippet"]["title"]
-                desc = v["snippet"].get("description", "")
-                if is_relevant_video(title, desc):
-                    relevant_videos.append(v)
 
-            if not relevant_videos:
-                continue
-
-            video_ids = [v["contentDetails"]["videoId"] for v in relevant_videos]
-            stats_map = get_video_stats(youtube, video_ids)
-
-            for v in relevant_videos:
-                vid = v["contentDetails"]["videoId"]
-                stats = stats_map.get(vid, {})
-
-                views = int(stats.get("viewCount", 0))
-                likes = int(stats.get("likeCount", 0))
-                comments = int(stats.get("commentCount", 0))
-
-                normalized_score = (views // 100) + likes + comments
-
-                all_videos.append(
-                    {
-                        "source_platform": "youtube",
-                        "external_id": vid,
-                        "title": v["snippet"]["title"],
-                        "content": v["snippet"].get("description", "")[:2000],
-                        "url": f"https://www.youtube.com/watch?v={vid}",
-                        "author_name": channel_name,
-                        "posted_at": v["snippet"]["publishedAt"],
-                        "engagement_score": normalized_score,
-                        "metadata": {
-                            "channel_id": channel_id,
-                            "views": views,
-                            "likes": likes,
-                            "comments": comments,
-                            "thumbnail": v["snippet"]["thumbnails"]["high"]["url"],
-                        },
-                        "raw_data": v,
-                    }
-                )
-
-        except Exception as e:
-            print(f"Error processing {channel_id}: {e}")
-
-    if all_videos:
-        try:
-            supabase.table("social_inputs").upsert(
-                all_videos,
-                on_conflict="source_platform, external_id",
-                ignore_duplicates=False,
-            ).execute()
-            print(f"✅ Saved {len(all_videos)} YouTube videos.")
-        except Exception as e:
-            print(f"DB Error: {e}")
+def main():
+    print("--- Starting YouTube Collection ---")
+    with spooled_writer() as writer:
+        saved = YouTubeSource().run(writer)
+    if saved:
+        print(f"✅ Spooled {saved} YouTube videos.")
     else:
         print("No relevant videos found this run.")
 
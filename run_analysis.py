@@ -1,7 +1,9 @@
 import os
+from datetime import datetime, timedelta, timezone
 from supabase import create_client
 from analysis.clustering import cluster_posts
 from analysis.llm_generator import analyze_trend
+from analysis.velocity import EngagementIndex, rank_clusters
 import dotenv
 
 dotenv.load_dotenv()
@@ -13,12 +15,47 @@ supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
 # Changed: only generate "Chat Widget" searches (no overlay/alerts)
 PRODUCT_SUFFIX = "Chat Widget"
 
+# Max analyze_trend calls per run; only the fastest-accelerating clusters get one.
+LLM_BUDGET_PER_RUN = int(os.environ.get("LLM_BUDGET_PER_RUN", "10"))
+# Every post in this window feeds the velocity index; the newest are clustered.
+ANALYSIS_WINDOW_DAYS = int(os.environ.get("ANALYSIS_WINDOW_DAYS", "7"))
+CLUSTER_INPUT_LIMIT = 500
+DB_PAGE_SIZE = 1000
+
+def window_cutoff():
+    return (datetime.now(timezone.utc) - timedelta(days=ANALYSIS_WINDOW_DAYS)).isoformat()
+
+def fetch_engagement_snapshot():
+    """
+    Lightweight id/engagement/posted_at for every post in the window, paged
+    past PostgREST's row cap, so each post gets a snapshot on every run.
+    """
+    cutoff = window_cutoff()
+    rows = []
+    start = 0
+    while True:
+        response = supabase.table("social_inputs")\
+            .select("id, engagement_score, posted_at")\
+            .gte("posted_at", cutoff)\
+            .order("id")\
+            .range(start, start + DB_PAGE_SIZE - 1)\
+            .execute()
+        rows.extend(response.data)
+        if len(response.data) < DB_PAGE_SIZE:
+            return rows
+        start += DB_PAGE_SIZE
+
 def fetch_recent_unprocessed_posts():
-    """Fetch raw social inputs."""
+    """
+    Fetch raw social inputs from the recent window, newest first. Selecting by
+    recency rather than raw engagement lets small, fast-rising posts reach
+    clustering.
+    """
     response = supabase.table("social_inputs")\
         .select("*")\
-        .order("engagement_score", desc=True)\
-        .limit(500)\
+        .gte("posted_at", window_cutoff())\
+        .order("posted_at", desc=True)\
+        .limit(CLUSTER_INPUT_LIMIT)\
         .execute()
     return response.data
 
@@ -32,20 +69,38 @@ def main():
         print("No data found. Run the collectors first.")
         return
 
+    # Fold this run's engagement snapshot of the whole window into the velocity index
+    snapshot = fetch_engagement_snapshot()
+    print(f"Snapshotting engagement for {len(snapshot)} posts from the last {ANALYSIS_WINDOW_DAYS} days.")
+    index = EngagementIndex.load()
+    index.update(
+        [p["id"] for p in snapshot],
+        [p.get("engagement_score") or 0 for p in snapshot],
+        [p.get("posted_at") for p in snapshot],
+    )
+    index.save()
+    velocities = index.current_velocity([p["id"] for p in raw_posts])
+
     clustering_input = []
-    for p in raw_posts:
+    for p, velocity in zip(raw_posts, velocities):
         text_content = f"{p.get('title', '')} {p.get('content', '')}"
         clustering_input.append({
             "id": p["id"],
             "text": text_content,
             "engagement": p.get("engagement_score", 0),
+            "velocity": float(velocity),
             "source": p.get("source_platform"),
         })
 
     clusters = cluster_posts(clustering_input)
 
-    for cluster_id, posts in clusters.items():
-        print(f"\nProcessing Cluster #{cluster_id} ({len(posts)} posts)...")
+    ranked = rank_clusters(clusters, LLM_BUDGET_PER_RUN)
+    if len(clusters) > len(ranked):
+        print(f"LLM budget: analyzing top {len(ranked)} of {len(clusters)} clusters by velocity.")
+
+    for cluster_id, cluster_velocity in ranked:
+        posts = clusters[cluster_id]
+        print(f"\nProcessing Cluster #{cluster_id} ({len(posts)} posts, velocity {cluster_velocity:.1f}/h)...")
 
         center_post = next((p for p in posts if p.get("is_centroid")), posts[0])
 
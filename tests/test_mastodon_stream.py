@@ -0,0 +1,210 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from collectors import mastodon_stream
+from collectors.mastodon_stream import CursorStore, HashtagStream, MicroBatcher
+
+TOKEN = "test-token"
+
+
+def make_status(status_id):
+    return {
+        "id": str(status_id),
+        "uri": f"https://fake.local/statuses/{status_id}",
+        "url": f"https://fake.local/@artist/{status_id}",
+        "content": f"<p>My cozy pixel setup #{status_id}</p>",
+        "account": {"acct": "artist"},
+        "created_at": "2026-01-01T00:00:00Z",
+    }
+
+
+class FakeMastodon:
+    """
+    Minimal fake instance split like mastodon.social: a web host serving the
+    tag timeline (honouring min_id/since_id/limit) and /api/v2/instance, whose
+    streaming endpoint only redirects to a separate streaming host that
+    requires the access token.
+
+    With `drop_first`, statuses 1-2 are on the timeline and the first stream
+    connection drops after sending them; statuses 3-7 are posted while the
+    client is disconnected. Otherwise statuses 1-7 are already posted. Every
+    later connection streams status 8 and then only heartbeats.
+    """
+
+    def __init__(self, drop_first=True):
+        self.timeline = [make_status(i) for i in range(1, 3 if drop_first else 8)]
+        self.drop_first = drop_first
+        self.connections = 0
+        self.unauthorized = 0
+        self.closed = threading.Event()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                on_streaming_host = self.server is fake.streaming_server
+                if on_streaming_host and url.path == "/api/v1/streaming/hashtag":
+                    if self.headers.get("Authorization") != f"Bearer {TOKEN}":
+                        fake.unauthorized += 1
+                        self.send_error(401)
+                        return
+                    fake.connections += 1
+                    self.stream(fake.connections)
+                elif on_streaming_host:
+                    self.send_error(404)
+                elif url.path == "/api/v2/instance":
+                    self.send_json({"configuration": {"urls": {"streaming": fake.streaming_url.replace("http", "ws")}}})
+                elif url.path.startswith("/api/v1/timelines/tag/"):
+                    self.send_json(fake.page(query))
+                elif url.path == "/api/v1/streaming/hashtag":
+                    self.send_response(301)
+                    self.send_header("Location", fake.streaming_url + self.path)
+                    self.end_headers()
+                else:
+                    self.send_error(404)
+
+            def send_json(self, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def send_event(self, status):
+                self.wfile.write(f"event: update\ndata: {json.dumps(status)}\n\n".encode())
+                self.wfile.flush()
+
+            def stream(self, connection):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                if connection == 1 and fake.drop_first:
+                    for status in fake.timeline[:2]:
+                        self.send_event(status)
+                    # Posted while the client is away, then drop the connection.
+                    fake.timeline.extend(make_status(i) for i in range(3, 8))
+                    return
+
+                latest = make_status(8)
+                fake.timeline.append(latest)
+                self.send_event(latest)
+                while not fake.closed.is_set():
+                    self.wfile.write(b":thump\n")
+                    self.wfile.flush()
+                    time.sleep(0.05)
+
+        self.servers = []
+        for _ in range(2):
+            server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            self.servers.append(server)
+        self.web_server, self.streaming_server = self.servers
+        self.base_url = f"http://127.0.0.1:{self.web_server.server_address[1]}"
+        self.streaming_url = f"http://127.0.0.1:{self.streaming_server.server_address[1]}"
+
+    def page(self, query):
+        limit = int(query.get("limit", 20))
+        newest_first = sorted(self.timeline, key=lambda s: int(s["id"]), reverse=True)
+        if "min_id" in query:
+            newer = [s for s in newest_first if int(s["id"]) > int(query["min_id"])]
+            return newer[-limit:]
+        if "since_id" in query:
+            newest_first = [s for s in newest_first if int(s["id"]) > int(query["since_id"])]
+        return newest_first[:limit]
+
+    def close(self):
+        self.closed.set()
+        for server in self.servers:
+            server.shutdown()
+
+
+class CollectingWriter:
+    def __init__(self):
+        self.ids = []
+
+    def write(self, rows, label):
+        self.ids.extend(row["external_id"].rsplit("/", 1)[1] for row in rows)
+        return len(rows)
+
+
+@pytest.fixture
+def fake_mastodon():
+    fake = FakeMastodon()
+    yield fake
+    fake.close()
+
+
+def collect_until(stream, writer, count):
+    thread = threading.Thread(target=stream.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while len(set(writer.ids)) < count and time.monotonic() < deadline:
+        time.sleep(0.05)
+    stream.stop()
+    thread.join(timeout=5)
+
+
+def test_reconnect_backfills_gap_without_loss(fake_mastodon, monkeypatch):
+    # Small pages force the backfill to page forward through the 5 missed statuses.
+    monkeypatch.setattr(mastodon_stream, "TIMELINE_LIMIT", 2)
+    writer = CollectingWriter()
+    batcher = MicroBatcher(writer, batch_size=1)
+    stream = HashtagStream("fake.local", "cozy", batcher, base_url=fake_mastodon.base_url, access_token=TOKEN)
+
+    collect_until(stream, writer, 8)
+
+    assert sorted(set(writer.ids), key=int) == [str(i) for i in range(1, 9)]
+    assert fake_mastodon.connections >= 2
+    assert fake_mastodon.unauthorized == 0
+    assert stream.streaming_url == fake_mastodon.streaming_url
+    assert stream.last_id == "8"
+
+
+def test_restart_backfills_from_saved_cursor(tmp_path):
+    fake = FakeMastodon(drop_first=False)
+    try:
+        cursors = CursorStore(str(tmp_path / "cursors.json"))
+        cursors.save({"cozy": "2"})
+        writer = CollectingWriter()
+        batcher = MicroBatcher(writer, batch_size=1, cursors=cursors)
+        stream = HashtagStream("fake.local", "cozy", batcher, base_url=fake.base_url, access_token=TOKEN,
+                               last_id=cursors.load()["cozy"])
+
+        collect_until(stream, writer, 6)
+        batcher.flush()
+    finally:
+        fake.close()
+
+    assert sorted(set(writer.ids), key=int) == [str(i) for i in range(3, 9)]
+    assert cursors.load() == {"cozy": "8"}
+
+
+def test_cursor_is_saved_only_after_rows_are_written(tmp_path):
+    class FailingWriter:
+        def write(self, rows, label):
+            raise ConnectionError("spool unavailable")
+
+    cursors = CursorStore(str(tmp_path / "cursors.json"))
+    batcher = MicroBatcher(FailingWriter(), batch_size=10, cursors=cursors)
+    stream = HashtagStream("fake.local", "cozy", batcher, session=object(), streaming_url="http://unused")
+    stream.handle_status(make_status(5))
+
+    with pytest.raises(ConnectionError):
+        batcher.flush()
+    assert cursors.load() == {}
+
+    batcher.writer = CollectingWriter()
+    batcher.flush()
+    assert batcher.writer.ids == ["5"]
+    assert cursors.load() == {"cozy": "5"}
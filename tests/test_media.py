@@ -0,0 +1,87 @@
+import io
+
+from PIL import Image
+
+from collectors import media
+from collectors.media import MediaStage, analyze_image
+
+URL = "https://i.redd.it/example.png"
+
+
+def png_bytes():
+    image = Image.new("RGB", (64, 64))
+    for x in range(64):
+        for y in range(64):
+            image.putpixel((x, y), (x * 4, y * 4, 128))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class FakeResponse:
+    def __init__(self, body, content_type):
+        self.body = body
+        self.headers = {"Content-Type": content_type, "Content-Length": str(len(body))}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, size):
+        yield self.body
+
+
+class FakeSession:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def get(self, url, **kwargs):
+        self.calls += 1
+        return self.responses.pop(0)
+
+
+def test_temporary_miss_is_retried_after_ttl(tmp_path, monkeypatch):
+    session = FakeSession([
+        FakeResponse(b"<html>rate limited</html>", "text/html"),
+        FakeResponse(png_bytes(), "image/png"),
+    ])
+    stage = MediaStage(cache_dir=str(tmp_path), session=session)
+
+    assert stage.features_for_url(URL) is None
+    assert stage.features_for_url(URL) is None
+    assert session.calls == 1
+
+    monkeypatch.setattr(media, "MISS_RETRY_SECONDS", 0)
+    features = stage.features_for_url(URL)
+    assert session.calls == 2
+    assert len(features["phash"]) == 16 and len(features["dhash"]) == 16
+
+    # Cached by URL: no further fetch.
+    assert stage.features_for_url(URL) == features
+    assert session.calls == 2
+
+
+def test_oversized_miss_is_permanent(tmp_path, monkeypatch):
+    session = FakeSession([FakeResponse(b"x" * 32, "image/png")])
+    monkeypatch.setattr(media, "MAX_MEDIA_BYTES", 16)
+    monkeypatch.setattr(media, "MISS_RETRY_SECONDS", 0)
+    stage = MediaStage(cache_dir=str(tmp_path), session=session)
+
+    assert stage.features_for_url(URL) is None
+    assert stage.features_for_url(URL) is None
+    assert session.calls == 1
+
+
+def test_analyze_image_reports_original_size_of_draft_decoded_jpeg():
+    buffer = io.BytesIO()
+    Image.new("RGB", (1920, 1080), (200, 120, 40)).save(buffer, format="JPEG")
+
+    features = analyze_image(buffer.getvalue())
+
+    assert (features["width"], features["height"]) == (1920, 1080)
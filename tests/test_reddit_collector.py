@@ -0,0 +1,104 @@
+import json
+
+import requests
+
+from collectors import base
+from collectors.reddit_collector import RedditSource, fetch_reddit_posts
+
+
+def listing(*titles):
+    children = [
+        {"kind": "t3", "data": {"id": f"p{i}", "title": title, "selftext": "", "created_utc": 1700000000}}
+        for i, title in enumerate(titles)
+    ]
+    return json.dumps({"kind": "Listing", "data": {"children": children}})
+
+
+class FakeSource:
+    def __init__(self, bodies):
+        self.bodies = bodies
+
+    def fetch_text(self, url, headers=None, params=None, content_type=None):
+        return self.bodies[url.rsplit("/", 1)[1]]
+
+
+def test_malformed_listing_is_skipped_not_fatal():
+    source = FakeSource({
+        "top.json": listing("cozy setup", "another cozy desk")[:-60],
+        "new.json": listing("pixel overlay"),
+    })
+
+    posts = fetch_reddit_posts(source, "Twitch")
+
+    assert "pixel overlay" in {p.title for p in posts}
+
+
+class BadJSONResponse:
+    status_code = 200
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        raise requests.JSONDecodeError("Expecting value", "<html>", 0)
+
+
+class FakeSession:
+    def __init__(self):
+        self.calls = 0
+
+    def get(self, *args, **kwargs):
+        self.calls += 1
+        return BadJSONResponse()
+
+
+def test_undecodable_json_is_retried_then_none(monkeypatch):
+    monkeypatch.setattr(base.time, "sleep", lambda seconds: None)
+    session = FakeSession()
+
+    assert base.fetch_json_with_backoff("https://example.invalid", session=session, max_retries=3) is None
+    assert session.calls == 3
+
+
+class TextResponse:
+    status_code = 200
+
+    def __init__(self, content_type, text):
+        self.headers = {"Content-Type": content_type}
+        self.text = text
+
+    def raise_for_status(self):
+        pass
+
+
+class SequenceSession:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def get(self, *args, **kwargs):
+        self.calls += 1
+        return self.responses.pop(0)
+
+
+def test_html_page_with_200_is_retried_not_read_as_empty_listing(monkeypatch):
+    monkeypatch.setattr(base.time, "sleep", lambda seconds: None)
+    session = SequenceSession([
+        TextResponse("text/html; charset=utf-8", "<html>Our CDN was unable to reach our servers</html>"),
+        TextResponse("application/json; charset=UTF-8", listing("cozy setup")),
+        TextResponse("application/json; charset=UTF-8", listing()),
+    ])
+    source = RedditSource(subreddits=["Twitch"], media_stage=False, session=session)
+    source.budget = None
+
+    posts = fetch_reddit_posts(source, "Twitch")
+
+    assert session.calls == 3
+    assert [p.title for p in posts] == ["cozy setup"]
+
+
+def test_body_without_children_is_reported_as_malformed(capsys):
+    source = FakeSource({"top.json": json.dumps({"error": 403}), "new.json": listing()})
+
+    assert fetch_reddit_posts(source, "Twitch") == []
+    assert "Malformed top listing for r/Twitch" in capsys.readouterr().out
@@ -0,0 +1,130 @@
+from collectors.base import SocialInputWriter
+from collectors.reddit_collector import INFO_BATCH_SIZE, RedditEngagementRefresh, build_engagement_update
+
+
+def stored_row(pid, upvotes=10, comments=2):
+    return {
+        "source_platform": "reddit",
+        "external_id": pid,
+        "title": f"post {pid}",
+        "url": f"https://reddit.com/r/test/comments/{pid}/",
+        "posted_at": "2024-01-01T00:00:00+00:00",
+        "engagement_score": upvotes + comments,
+        "metadata": {"subreddit": "test", "upvotes": upvotes, "comments": comments, "upvote_ratio": 0.9},
+        "raw_data": {"id": pid},
+    }
+
+
+class FakeQuery:
+    def __init__(self, client, rows):
+        self.client = client
+        self.rows = rows
+        self._range = (0, len(rows) - 1)
+
+    def select(self, columns):
+        self.client.selected.append(columns)
+        return self
+
+    def eq(self, *args):
+        return self
+
+    def gte(self, *args):
+        return self
+
+    def range(self, start, end):
+        self._range = (start, end)
+        return self
+
+    def execute(self):
+        start, end = self._range
+        return type("Response", (), {"data": self.rows[start:end + 1]})()
+
+
+class FakeClient:
+    """Supabase stand-in serving `stored` rows on select and recording each upsert call."""
+
+    def __init__(self, stored=()):
+        self.stored = list(stored)
+        self.selected = []
+        self.upserts = []
+
+    def table(self, name):
+        return self
+
+    def select(self, columns):
+        return FakeQuery(self, self.stored).select(columns)
+
+    def upsert(self, rows, **kwargs):
+        self.upserts.append(rows)
+        return self
+
+    def execute(self):
+        pass
+
+
+class FakeRefresh(RedditEngagementRefresh):
+    """Answers /api/info from `live` (id -> (score, num_comments)) and records the fullnames asked for."""
+
+    def __init__(self, live, **kwargs):
+        super().__init__(session=object(), **kwargs)
+        self.live = live
+        self.requested = []
+
+    def fetch_json(self, url, headers=None, params=None):
+        fullnames = params["id"].split(",")
+        self.requested.append(fullnames)
+        children = []
+        for fullname in fullnames:
+            pid = fullname[len("t3_"):]
+            score, comments = self.live[pid]
+            children.append({"kind": "t3", "data": {"id": pid, "score": score, "num_comments": comments}})
+        return {"data": {"children": children}}
+
+
+def test_build_engagement_update_keeps_the_full_row():
+    row = stored_row("a")
+
+    assert build_engagement_update(row, {"id": "a", "score": 10, "num_comments": 2}) is None
+
+    update = build_engagement_update(row, {"id": "a", "score": 50, "num_comments": 7, "upvote_ratio": 0.95})
+    assert update["engagement_score"] == 57
+    assert update["metadata"] == {"subreddit": "test", "upvotes": 50, "comments": 7, "upvote_ratio": 0.95}
+    assert {k: v for k, v in update.items() if k not in ("engagement_score", "metadata")} == \
+        {k: v for k, v in row.items() if k not in ("engagement_score", "metadata")}
+    assert row["metadata"]["upvotes"] == 10
+
+
+def test_refresh_requests_100_fullnames_per_call_and_yields_only_changes():
+    rows = [stored_row(f"p{i}") for i in range(250)]
+    live = {row["external_id"]: (10, 2) for row in rows}
+    live["p5"] = (11, 2)
+    live["p120"] = (10, 9)
+
+    refresh = FakeRefresh(live, client=FakeClient(rows))
+    batches = list(refresh.iter_batches())
+
+    assert [len(chunk) for chunk in refresh.requested] == [INFO_BATCH_SIZE, INFO_BATCH_SIZE, 50]
+    assert refresh.requested[0][0] == "t3_p0"
+    assert [[row["external_id"] for row in updates] for _, updates in batches] == [["p5"], ["p120"], []]
+
+
+def test_refresh_upserts_whole_rows_once_per_chunk():
+    rows = [stored_row(f"p{i}") for i in range(150)]
+    live = {row["external_id"]: (99, 1) for row in rows}
+    client = FakeClient(rows)
+
+    saved = FakeRefresh(live, client=client).run(SocialInputWriter(client))
+
+    assert saved == 150
+    assert client.selected == ["*"]
+    assert [len(batch) for batch in client.upserts] == [100, 50]
+    assert all(row["title"] and row["url"] and row["posted_at"] for batch in client.upserts for row in batch)
+    assert client.upserts[1][0]["engagement_score"] == 100
+
+
+def test_refresh_skips_when_recent_rows_cannot_be_loaded():
+    class DownClient(FakeClient):
+        def select(self, columns):
+            raise ConnectionError("supabase unreachable")
+
+    assert list(FakeRefresh({}, client=DownClient()).iter_batches()) == []
@@ -0,0 +1,93 @@
+import time
+
+import pytest
+
+from collectors import base, runner
+from collectors.base import RateBudget, Source, register_source
+
+
+class RecordingWriter:
+    def __init__(self):
+        self.batches = []
+
+    def write(self, rows, label):
+        self.batches.append((label, rows))
+        return len(rows)
+
+
+class FakeSource(Source):
+    name = "fake"
+
+    def __init__(self):
+        super().__init__(session=object())
+
+    def iter_batches(self):
+        yield "fake batch 1", [{"source_platform": "fake", "external_id": "1"}]
+        yield "fake batch 2", [{"source_platform": "fake", "external_id": "2"},
+                               {"source_platform": "fake", "external_id": "3"}]
+
+
+class BrokenSetupSource(Source):
+    name = "broken_setup"
+
+    def __init__(self):
+        raise RuntimeError("media stage unavailable")
+
+
+class FailingSource(FakeSource):
+    name = "failing"
+
+    def iter_batches(self):
+        yield "failing batch", [{"source_platform": "failing", "external_id": "1"}]
+        raise ConnectionError("upstream down")
+
+
+@pytest.fixture
+def fake_registry(monkeypatch):
+    """Swap in an empty registry and skip importing the real collector modules."""
+    monkeypatch.setattr(runner, "SOURCE_MODULES", [])
+    for name in list(base.SOURCES):
+        monkeypatch.delitem(base.SOURCES, name)
+    for cls in (FakeSource, BrokenSetupSource, FailingSource):
+        register_source(cls)
+    return base.SOURCES
+
+
+def test_register_source_requires_a_name():
+    class Nameless(Source):
+        pass
+
+    with pytest.raises(ValueError):
+        register_source(Nameless)
+
+
+def test_load_sources_selects_by_name_and_rejects_unknown(fake_registry):
+    assert runner.load_sources() == fake_registry
+    assert runner.load_sources(["fake"]) == {"fake": FakeSource}
+
+    with pytest.raises(ValueError, match="nope"):
+        runner.load_sources(["fake", "nope"])
+
+
+def test_unknown_source_on_command_line_raises(fake_registry, monkeypatch):
+    monkeypatch.setattr("sys.argv", ["runner", "--sources", "fake,nope", "--direct"])
+    with pytest.raises(ValueError, match="Unknown source"):
+        runner.main()
+
+
+def test_run_sources_isolates_failing_sources(fake_registry):
+    writer = RecordingWriter()
+
+    results = runner.run_sources(writer=writer)
+
+    assert results == {"fake": 3, "broken_setup": 0, "failing": 0}
+    labels = sorted(label for label, _ in writer.batches)
+    assert labels == ["failing batch", "fake batch 1", "fake batch 2"]
+
+
+def test_rate_budget_spaces_calls():
+    budget = RateBudget(per_minute=600)
+    started = time.monotonic()
+    for _ in range(4):
+        budget.wait()
+    assert time.monotonic() - started >= 0.3 - 0.01
@@ -0,0 +1,111 @@
+import fcntl
+import json
+import os
+
+from collectors.spool import (
+    DEAD_LETTER_DIR,
+    DRAIN_LOCK_NAME,
+    OPEN_SUFFIX,
+    Drainer,
+    SpoolWriter,
+    seal_orphaned_segments,
+)
+
+
+class FakeAPIError(Exception):
+    def __init__(self, code):
+        super().__init__(f"code {code}")
+        self.code = code
+
+
+class FakeClient:
+    """Supabase stand-in: rejects `bad_ids` with a NOT NULL violation, or everything while `down`."""
+
+    def __init__(self, bad_ids=()):
+        self.bad_ids = set(bad_ids)
+        self.down = False
+        self.saved = {}
+
+    def table(self, name):
+        return self
+
+    def upsert(self, rows, **kwargs):
+        self._pending = rows
+        return self
+
+    def execute(self):
+        if self.down:
+            raise ConnectionError("supabase unreachable")
+        if any(row["external_id"] in self.bad_ids for row in self._pending):
+            raise FakeAPIError("23502")
+        for row in self._pending:
+            self.saved[row["external_id"]] = row
+
+
+def spool_segments(spool_dir, segments):
+    writer = SpoolWriter(spool_dir)
+    for ids in segments:
+        writer.write([{"source_platform": "reddit", "external_id": i} for i in ids], "test")
+        writer.close()
+
+
+def test_rejected_row_is_dead_lettered_and_later_segments_drain(tmp_path):
+    spool_dir = str(tmp_path)
+    spool_segments(spool_dir, [["a", "b", "bad", "c"], ["d"], ["e", "f"]])
+    client = FakeClient(bad_ids={"bad"})
+
+    drainer = Drainer(spool_dir, client=client, batch_size=3)
+    assert drainer.drain_once() == 3
+
+    assert sorted(client.saved) == ["a", "b", "c", "d", "e", "f"]
+    assert drainer.sealed_segments() == []
+    dead_dir = os.path.join(spool_dir, DEAD_LETTER_DIR)
+    dead = [json.loads(line) for name in os.listdir(dead_dir) for line in open(os.path.join(dead_dir, name))]
+    assert [entry["row"]["external_id"] for entry in dead] == ["bad"]
+
+
+def test_transient_error_keeps_segments_for_next_pass(tmp_path):
+    spool_dir = str(tmp_path)
+    spool_segments(spool_dir, [["a"], ["b"]])
+    client = FakeClient()
+    client.down = True
+
+    drainer = Drainer(spool_dir, client=client)
+    assert drainer.drain_once() == 0
+    assert len(drainer.sealed_segments()) == 2
+    assert not os.path.exists(os.path.join(spool_dir, DEAD_LETTER_DIR))
+
+    client.down = False
+    assert drainer.drain_once() == 2
+    assert sorted(client.saved) == ["a", "b"]
+
+
+def test_second_drainer_skips_pass_while_lock_is_held(tmp_path):
+    spool_dir = str(tmp_path)
+    spool_segments(spool_dir, [["a"]])
+    client = FakeClient()
+
+    with open(os.path.join(spool_dir, DRAIN_LOCK_NAME), "a") as lock:
+        fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        assert Drainer(spool_dir, client=client).drain_once() == 0
+        assert client.saved == {}
+
+    assert Drainer(spool_dir, client=client).drain_once() == 1
+    assert sorted(client.saved) == ["a"]
+
+
+def test_only_unlocked_open_segments_are_sealed(tmp_path):
+    spool_dir = str(tmp_path)
+    live = SpoolWriter(spool_dir)
+    live.write([{"source_platform": "reddit", "external_id": "live"}], "test")
+    # Left by a process on another host: its PID means nothing here, but no one holds its lock.
+    orphan = os.path.join(spool_dir, f"segment-{0:020d}-{os.getpid()}-000001{OPEN_SUFFIX}")
+    with open(orphan, "w") as f:
+        f.write(json.dumps({"source_platform": "reddit", "external_id": "orphan"}) + "\n")
+
+    seal_orphaned_segments(spool_dir)
+
+    sealed = Drainer(spool_dir, client=FakeClient()).sealed_segments()
+    assert sealed == [orphan[: -len(OPEN_SUFFIX)] + ".jsonl"]
+    assert os.path.exists(live._path)
+    live.close()
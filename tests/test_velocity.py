@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from analysis.velocity import HISTORY_RETENTION_DAYS, EngagementIndex, rank_clusters
+
+NOW = 1_800_000_000.0
+HOUR = 3600.0
+
+
+def iso(ts):
+    return np.datetime_as_string(np.datetime64(int(ts), "s")) + "Z"
+
+
+def test_fresh_post_velocity_is_floored_to_one_hour(tmp_path):
+    index = EngagementIndex(str(tmp_path / "index.npz"))
+    index.update(["fresh", "viral"], [3, 5000], [iso(NOW - 120), iso(NOW - 7 * 24 * HOUR)], now=NOW)
+
+    fresh, viral = index.current_velocity(["fresh", "viral"], now=NOW)
+    assert fresh == pytest.approx(3.0)
+    assert viral == pytest.approx(5000 / (7 * 24))
+    assert viral > fresh
+
+
+def test_missing_posted_at_starts_at_zero_velocity(tmp_path):
+    index = EngagementIndex(str(tmp_path / "index.npz"))
+    index.update(["undated", "garbled"], [400, 400], [None, "not a date"], now=NOW)
+    assert list(index.current_velocity(["undated", "garbled"], now=NOW)) == [0.0, 0.0]
+
+    # The next snapshot measures real growth from this run's baseline.
+    index.update(["undated"], [800], [None], now=NOW + 4 * HOUR)
+    assert index.current_velocity(["undated"], now=NOW + 4 * HOUR)[0] > 0
+
+
+def test_index_round_trips_and_ranks_accelerating_cluster_first(tmp_path):
+    path = str(tmp_path / "index.npz")
+    index = EngagementIndex(path)
+    index.update(["stale", "rising"], [10000, 10], [iso(NOW - 30 * 24 * HOUR), iso(NOW - 2 * HOUR)], now=NOW)
+    index.save()
+
+    index = EngagementIndex.load(path)
+    later = NOW + 4 * HOUR
+    index.update(["stale", "rising"], [10001, 600], [None, None], now=later)
+    stale, rising = index.current_velocity(["stale", "rising"], now=later)
+
+    clusters = {0: [{"velocity": stale}], 1: [{"velocity": rising}]}
+    assert [label for label, _ in rank_clusters(clusters, 1)] == [1]
+
+
+def test_posts_unseen_past_retention_are_pruned_on_save(tmp_path):
+    path = str(tmp_path / "index.npz")
+    index = EngagementIndex(path)
+    index.update(["old", "kept"], [10, 10], [iso(NOW - HOUR)] * 2, now=NOW)
+    later = NOW + (HISTORY_RETENTION_DAYS + 1) * 24 * HOUR
+    index.update(["kept", "new"], [50, 5], [None, iso(later - HOUR)], now=later)
+    before = index.current_velocity(["kept", "new"], now=later)
+    index.save()
+
+    index = EngagementIndex.load(path)
+    assert sorted(index.ids.tolist()) == ["kept", "new"]
+    assert list(index.current_velocity(["kept", "new"], now=later)) == list(before)
+    assert index.current_velocity(["old"], now=later)[0] == 0.0